@@ -2,14 +2,23 @@ from chalice import Chalice
 import os
 import json
 import logging
+import functools
 
-from chalicelib.lib.factory import factory, json_factory
-from chalicelib.lib.add import post_event
-from chalicelib.lib.delete import delete_event
+from chalicelib.lib.factory import factory, json_factory, date_range, date_to_string
+from chalicelib.lib.add import post_events, post_each
+from chalicelib.lib.delete import delete_events
 from chalicelib.lib.slack import (slack_payload_extractor, submit_message_menu,
-                                  delete_message_menu, verify_token, Slack)
+                                  delete_message_menu, verify_request, Slack, slack_responder,
+                                  configure_dm_channel_cache, configure_rate_limiter,
+                                  deferred_rate_limits, rate_limit_stats, payload_team_id, bot_token, RateLimited,
+                                  MAX_REQUEST_AGE, REQUEST_VALID, REQUEST_DUPLICATE)
 
-from chalicelib.lib.helpers import parse_config
+from chalicelib.lib.helpers import load_config
+from chalicelib.lib import client, timing
+from chalicelib.lib.worker import create_queue
+from chalicelib.lib.lock import configure_lock_index
+from chalicelib.lib.dates import resolve, months_in_range
+from chalicelib.lib.list import configure_list_cache, invalidate
 from chalicelib.action import Action
 
 app = Chalice(app_name='timereport')
@@ -19,59 +28,189 @@ app.debug = True
 logger = logging.getLogger()
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
-config = parse_config(f'{dir_path}/chalicelib/config.yaml')
+config = load_config(f'{dir_path}/chalicelib/config.yaml')
 config['backend_url'] = os.getenv('backend_url')
 config['bot_access_token'] = os.getenv('bot_access_token')
+# Bot tokens of other workspaces, as a json object of team ID -> token
+config['bot_access_tokens'] = json.loads(os.getenv('bot_access_tokens') or '{}')
 config['signing_secret'] = os.getenv('signing_secret')
+config['slack_api_url'] = os.getenv('slack_api_url') or config.get('slack_api_url')
 logger.setLevel(config['log_level'])
-slack = Slack(slack_token=config["bot_access_token"])
+client.configure(
+    pool_connections=config.get('http_pool_connections'),
+    pool_maxsize=config.get('http_pool_maxsize'),
+    timeout=config.get('http_timeout'),
+    host_timeouts=config.get('http_host_timeouts'),
+    retry_attempts=config.get('http_retry_attempts'),
+    retry_backoff=config.get('http_retry_backoff'),
+    retry_max_backoff=config.get('http_retry_max_backoff'),
+    failure_threshold=config.get('circuit_failure_threshold'),
+    reset_timeout=config.get('circuit_reset_timeout'),
+)
+timing.configure(
+    enable=config.get('timing_enabled', False),
+    metric_namespace=config.get('timing_namespace', 'timereport'),
+)
+configure_dm_channel_cache(
+    maxsize=config.get('dm_channel_cache_size', 1024),
+    ttl=config.get('dm_channel_cache_ttl', 24 * 60 * 60),
+    path=config.get('dm_channel_cache_path'),
+)
+configure_rate_limiter(
+    limits=config.get('slack_rate_limits'),
+    max_wait=config.get('slack_rate_max_wait', 1),
+    deferred_max_wait=config.get('slack_rate_deferred_max_wait', 60),
+    max_retries=config.get('slack_rate_max_retries', 3),
+)
+configure_lock_index(
+    maxsize=config.get('lock_cache_size', 4096),
+    locked_ttl=config.get('lock_cache_locked_ttl', 24 * 60 * 60),
+    unlocked_ttl_seconds=config.get('lock_cache_unlocked_ttl', 5 * 60),
+)
+configure_list_cache(
+    maxsize=config.get('list_cache_size', 512),
+    ttl=config.get('list_cache_ttl', 60),
+)
+
+
+def instrumented(route):
+    """
+    Time the route and print a timing breakdown of its outbound calls when timing is enabled
+    """
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+        try:
+            with timing.request(route.__name__):
+                return route(*args, **kwargs)
+        finally:
+            logger.debug(f"Slack rate limiter: {rate_limit_stats()}")
+    return wrapper
+
+
+def verified(route):
+    """
+    Verify the slack signature of the request before the route parses anything.
+    Duplicates are answered with an empty response so slack stops retrying.
+    """
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+        request = app.current_request
+        result = verify_request(
+            request.headers,
+            request.raw_body,
+            config['signing_secret'],
+            max_age=config.get('request_max_age', MAX_REQUEST_AGE),
+        )
+        if result == REQUEST_DUPLICATE:
+            return ''
+        if result != REQUEST_VALID:
+            logger.info(f"Rejected {result} request to {request.context.get('resourcePath')}")
+            return 'Slack signing secret not valid'
+        return route(*args, **kwargs)
+    return wrapper
+
+
+def interactive_responder(payload, user_id):
+    """
+    Get a function replacing the message the user clicked in.
+
+    In response_url mode the message is replaced through the response_url of
+    the payload, which needs no slack API calls. Otherwise the message is
+    updated with chat.update, in the channel and at the timestamp of the
+    message in the payload. The direct message channel is only looked up if
+    the payload has no channel. If slack rate limits the update, the message
+    is replaced through the response_url instead.
+    """
+    if config.get('interactive_mode', 'response_url') == 'response_url' and payload.get('response_url'):
+        return functools.partial(slack_responder, payload['response_url'], replace_original=True)
+
+    team_id = payload_team_id(payload)
+    slack = Slack(
+        slack_token=bot_token(config, team_id),
+        base_url=config['slack_api_url'],
+        channel=(payload.get('channel') or {}).get('id'),
+        ts=payload.get('message_ts'),
+        team_id=team_id,
+    )
+
+    def respond(message):
+        try:
+            if not slack.slack_dm_channel:
+                slack.open_conversation(slack_user_id=user_id)
+            return slack.update_message(message=message)
+        except RateLimited as error:
+            if not payload.get('response_url'):
+                logger.info(f"Dropping message, slack rate limited the update: {error}")
+                return None
+            logger.info(f"Updating through the response_url, slack rate limited the update: {error}")
+            return slack_responder(payload['response_url'], message, replace_original=True)
+    return respond
+
+
+def hang_on(respond, days):
+    """
+    Tell the user to wait when the backend has many days to handle
+    """
+    if days >= config.get('interim_message_min_days', 10):
+        respond("Ok, hang on while I do this!")
+
 
 @app.route('/interactive', methods=['POST'], content_types=['application/x-www-form-urlencoded'])
+@instrumented
+@verified
 def interactive():
     req = app.current_request.raw_body.decode()
     payload = slack_payload_extractor(req)
     selection = payload.get('actions')[0].get('value')
     user_id = payload['user']['id']
+    respond = interactive_responder(payload, user_id)
 
-    if not slack.is_conversation_open:
-        logger.debug("Need to open slack conversation")
-        slack.open_conversation(slack_user_id=user_id)
-
-    if not slack.slack_dm_channel:
-        logger.debug("Need to find slack direct message channel ID")
-        slack.open_conversation(slack_user_id=user_id)
-    
     logger.info(f"Selection is: {selection}")
     logger.debug(f"User id is: {user_id}")
     slack_response_message = "Action canceled :x:"
 
     if selection == "submit_yes":
-        slack.update_message("Ok, hang on while I do this!")
-
         if payload.get('callback_id') == 'delete':
             message = payload['original_message']['attachments'][0]['fields']
             date = message[1]['value']
-            delete_by_date = delete_event(f"{config['backend_url']}/event/users/{user_id}", date)
-            logger.info(f"Delete event posted to URL: {config['backend_url']}/event/users/{user_id}")
-            if delete_by_date.status_code != 200:
-                logger.debug(
-                    f"Error from backend: status code: {delete_by_date.status_code}. Response text: {delete_by_date.text}"
-                )
+            url = f"{config['backend_url']}/event/users/{user_id}"
+            try:
+                dates = [date_to_string(d) for d in date_range(*resolve(date))]
+            except ValueError:
+                logger.info(f"Invalid date to delete: {date}")
+                respond(f"Sorry, {date} is not a valid date")
+                return ''
+            hang_on(respond, len(dates))
+            failed_dates = delete_events(url, dates, max_workers=config.get('max_workers', 8))
+            invalidate(user_id, months_in_range(dates[0], dates[-1]))
+            logger.info(f"Delete events posted to URL: {url}")
+            if failed_dates:
+                logger.debug(f"Error from backend when deleting: {failed_dates}")
                 slack_response_message = 'Got unexpected response from backend'
+                if len(dates) > 1:
+                    slack_response_message += f" for these dates: ```{failed_dates} ```"
             else:
                 slack_response_message = f'Successfully deleted entry: {date}'
 
         if payload.get('callback_id') == 'add':
             slack_response_message = 'Added successfully :white_check_mark:'
-            events = json_factory(payload)
-            failed_events = list()
-            for event in events:
-                response = post_event(f"{config['backend_url']}/event/users/{user_id}", json.dumps(event))
-                if response.status_code != 200:
-                    logger.debug(
-                        f"Event {event} got unexpected response from backend: {response.text}"
-                    )
-                    failed_events.append(event.get('event_date'))
+            events = json_factory(
+                payload,
+                working_days_only=config.get('working_days_only', False),
+                calendar=config.get('holiday_calendar', 'se'),
+                extra_holidays=config.get('extra_holidays') or (),
+            )
+            hang_on(respond, len(events))
+            url = f"{config['backend_url']}/event/users/{user_id}"
+            max_workers = config.get('max_workers', 8)
+            if config.get('bulk_add'):
+                failed_events = post_events(
+                    url, events, chunk_size=config.get('bulk_chunk_size', 31), max_workers=max_workers
+                )
+            else:
+                failed_events = post_each(url, events, max_workers=max_workers)
+            if events:
+                invalidate(user_id, months_in_range(events[0].event_date, events[-1].event_date))
 
             if failed_events:
                 logger.debug(f"Got {len(failed_events)} events")
@@ -79,24 +218,54 @@ def interactive():
                     f"Successfully added {len(events) - len(failed_events)} events.\n"
                     f"These however failed: ```{failed_events} ```"
                 )
-    
-    slack.update_message(message=slack_response_message)
+
+    respond(slack_response_message)
     return ''
 
 
 @app.route('/command', methods=['POST'], content_types=['application/x-www-form-urlencoded'])
+@instrumented
+@verified
 def index():
     req = app.current_request.raw_body.decode()
-    req_headers = app.current_request.headers
-    if not verify_token(req_headers, req, config['signing_secret']):
-        return 'Slack signing secret not valid'
-
     payload = slack_payload_extractor(req)
 
     logger.info(f'payload is: {payload}')
 
+    if config.get('command_mode') == 'deferred':
+        get_worker_queue().put(payload)
+        return ''
+
     action = Action(payload, config)
 
     action.perform_action()
 
     return ''
+
+
+worker_queue = None
+
+
+def get_worker_queue():
+    """
+    Get the queue for deferred slash commands, creating it on first use
+    """
+    global worker_queue
+    if worker_queue is None:
+        kwargs = {}
+        if config.get('worker_queue') == 'sqlite':
+            kwargs['path'] = config.get('worker_queue_path', '/tmp/timereport_jobs.sqlite')
+            kwargs['retry_backoff'] = config.get('worker_retry_backoff', 5.0)
+        worker_queue = create_queue(config.get('worker_queue', 'thread'), run_deferred_action, **kwargs)
+    return worker_queue
+
+
+def run_deferred_action(payload):
+    """
+    Perform a slash command handed over by the /command route.
+    Results are posted to the response_url of the command.
+    """
+    logger.debug(f"Running deferred action for payload: {payload}")
+    # Slack isn't waiting on deferred commands, so their slack calls may wait out Retry-After
+    with timing.request('deferred_command'), deferred_rate_limits():
+        Action(payload, config, respond_via_url=True).perform_action()
@@ -0,0 +1,371 @@
+"""
+Local stand-ins for the timereport backend and the slack web API.
+
+Both run as real HTTP servers on localhost with configurable latency,
+error rate and rate limiting, so the app can be load tested without AWS
+or slack. Point the app at them with the backend_url and slack_api_url
+environment variables:
+
+    python benchmarks/fakes.py --latency 0.1 --error-rate 0.01
+    backend_url=http://127.0.0.1:8001 slack_api_url=http://127.0.0.1:8002/api/ chalice local
+"""
+import argparse
+import collections
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Faults:
+    """
+    Latency, errors and rate limiting applied to every request
+
+    :param latency: Seconds added to every request
+    :param jitter: Max random seconds added on top of latency
+    :param error_rate: Fraction of requests answered with an error (0.0 - 1.0)
+    :param rate_limit: Max requests per second per path, or None for no limit
+    :param retry_after: Seconds sent in the Retry-After header when rate limited
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=None, retry_after=1, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._windows = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        time.sleep(self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0))
+
+    def should_fail(self):
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def is_rate_limited(self, key):
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows[key]
+            while window and window[0] <= now - 1:
+                window.popleft()
+            if len(window) >= self.rate_limit:
+                return True
+            window.append(now)
+            return False
+
+
+class FakeServer:
+    """
+    Base class running a request handler on a background thread.
+    Use as a context manager or call start() and stop().
+    """
+
+    def __init__(self, faults=None, host='127.0.0.1', port=0):
+        self.faults = faults or Faults()
+        self.host = host
+        self.port = port
+        self.calls = collections.Counter()
+        self.rejected = collections.Counter()
+        self._calls_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}'
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                fake._dispatch(self, 'GET')
+
+            def do_POST(self):
+                fake._dispatch(self, 'POST')
+
+            def do_DELETE(self):
+                fake._dispatch(self, 'DELETE')
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def total_calls(self):
+        with self._calls_lock:
+            return sum(self.calls.values())
+
+    def reset_counters(self):
+        with self._calls_lock:
+            self.calls.clear()
+            self.rejected.clear()
+
+    def _dispatch(self, handler, method):
+        parsed = urlparse(handler.path)
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        key = f'{method} {self.route_name(parsed.path)}'
+        with self._calls_lock:
+            self.calls[key] += 1
+
+        self.faults.delay()
+        if self.faults.is_rate_limited(key):
+            with self._calls_lock:
+                self.rejected[key] += 1
+            return self._send(handler, 429, self.rate_limited_body(), {'Retry-After': str(self.faults.retry_after)})
+        if self.faults.should_fail():
+            with self._calls_lock:
+                self.rejected[key] += 1
+            return self._send(handler, 500, self.error_body())
+
+        status, payload = self.handle(method, parsed.path, parse_qs(parsed.query), body, handler.headers)
+        self._send(handler, status, payload)
+
+    def _send(self, handler, status, payload, headers=None):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json; charset=utf-8')
+        handler.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def route_name(self, path):
+        return path
+
+    def rate_limited_body(self):
+        return {'message': 'Too many requests'}
+
+    def error_body(self):
+        return {'message': 'Internal server error'}
+
+    def handle(self, method, path, query, body, headers):
+        raise NotImplementedError
+
+
+def _decode_json(body):
+    """
+    The app posts events with json=<json string>, so the body can be json encoded twice
+    """
+    data = json.loads(body.decode('utf-8'))
+    if isinstance(data, str):
+        data = json.loads(data)
+    return data
+
+
+class FakeBackend(FakeServer):
+    """
+    The timereport backend routes used by chalicelib.lib:
+
+    GET    /event/users/{user_id}?startDate=&endDate=
+    POST   /event/users/{user_id}  (one event, or a list of events)
+    DELETE /event/users/{user_id}?date=
+    POST   /lock
+    """
+
+    user_path = re.compile(r'^(?P<prefix>.*)/event/users/(?P<user_id>[^/]+)$')
+
+    def __init__(self, faults=None, host='127.0.0.1', port=0, batch_support=True):
+        super().__init__(faults, host, port)
+        self.batch_support = batch_support
+        self.events = collections.defaultdict(dict)
+        self.locks = set()
+        self._lock = threading.Lock()
+
+    def route_name(self, path):
+        return '/event/users/{id}' if self.user_path.match(path) else path
+
+    def handle(self, method, path, query, body, headers):
+        if path.endswith('/lock') and method == 'POST':
+            lock = _decode_json(body)
+            with self._lock:
+                self.locks.add((lock['user_id'], lock['event_date']))
+                for event in self.events[lock['user_id']].values():
+                    if event['event_date'].startswith(lock['event_date']):
+                        event['lock'] = True
+            return 200, lock
+
+        match = self.user_path.match(path)
+        if not match:
+            return 404, {'message': 'Not found'}
+        user_id = match.group('user_id')
+
+        if method == 'GET':
+            start, end = query.get('startDate', [''])[0], query.get('endDate', ['9999'])[0]
+            with self._lock:
+                events = [event for date, event in sorted(self.events[user_id].items()) if start <= date <= end]
+            return 200, events
+
+        if method == 'POST':
+            data = _decode_json(body)
+            if isinstance(data, list) and not self.batch_support:
+                return 405, {'message': 'Batches not supported'}
+            with self._lock:
+                for event in data if isinstance(data, list) else [data]:
+                    event = dict(event, user_id=user_id)
+                    event['lock'] = (user_id, event['event_date'][:7]) in self.locks
+                    self.events[user_id][event['event_date']] = event
+            return 200, data
+
+        if method == 'DELETE':
+            date = query.get('date', [''])[0]
+            with self._lock:
+                deleted = self.events[user_id].pop(date, None)
+            return (200, deleted) if deleted else (404, {'message': f'No event on {date}'})
+
+        return 405, {'message': 'Method not allowed'}
+
+
+class FakeSlack(FakeServer):
+    """
+    The slack web API methods used by chalicelib.lib.slack, under /api/, and
+    response_url endpoints under /response/.
+    """
+
+    def __init__(self, faults=None, host='127.0.0.1', port=0):
+        super().__init__(faults, host, port)
+        self.messages = {}
+        self.responses = []
+        self.uploads = []
+        # channel ID -> list of member user IDs, for conversations.members
+        self.channels = {}
+        # User IDs listed as bots by users.list
+        self.bots = set()
+        self._ts = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def api_url(self):
+        return f'{self.url}/api/'
+
+    def response_url(self, name='fake'):
+        return f'{self.url}/response/{name}'
+
+    def rate_limited_body(self):
+        return {'ok': False, 'error': 'ratelimited'}
+
+    def error_body(self):
+        return {'ok': False, 'error': 'internal_error'}
+
+    def route_name(self, path):
+        return '/response/{id}' if path.startswith('/response/') else path
+
+    def handle(self, method, path, query, body, headers):
+        if path.startswith('/response/'):
+            with self._lock:
+                self.responses.append(json.loads(body.decode('utf-8') or '{}'))
+            return 200, b'ok'
+
+        if path.endswith('/files.upload'):
+            # Multipart, kept as is
+            with self._lock:
+                self.uploads.append(body)
+            return 200, {'ok': True, 'file': {'id': f'F{next(self._ts)}'}}
+
+        if (headers.get('Content-Type') or '').startswith('application/json'):
+            params = json.loads(body.decode('utf-8') or '{}')
+        else:
+            params = {key: values[0] for key, values in parse_qs(body.decode('utf-8', 'replace')).items()}
+        params.update({key: values[0] for key, values in query.items()})
+
+        method_name = path.rsplit('/', 1)[-1]
+        if method_name == 'conversations.open':
+            users = params.get('users') or ['UNKNOWN']
+            user = users[0] if isinstance(users, list) else users.split(',')[0]
+            return 200, {'ok': True, 'already_open': True, 'channel': {'id': f'D{user}'}}
+
+        if method_name == 'conversations.members':
+            members = self.channels.get(params.get('channel'))
+            if members is None:
+                return 200, {'ok': False, 'error': 'channel_not_found'}
+            start = int(params.get('cursor') or 0)
+            end = start + int(params.get('limit') or 100)
+            return 200, {
+                'ok': True,
+                'members': members[start:end],
+                'response_metadata': {'next_cursor': str(end) if end < len(members) else ''},
+            }
+
+        if method_name == 'users.list':
+            with self._lock:
+                user_ids = sorted({user for members in self.channels.values() for user in members} | self.bots)
+            start = int(params.get('cursor') or 0)
+            end = start + int(params.get('limit') or 100)
+            return 200, {
+                'ok': True,
+                'members': [
+                    {'id': user, 'is_bot': user in self.bots, 'deleted': False} for user in user_ids[start:end]
+                ],
+                'response_metadata': {'next_cursor': str(end) if end < len(user_ids) else ''},
+            }
+
+        if method_name in ('chat.postMessage', 'chat.update'):
+            ts = params.get('ts') or f'{next(self._ts)}.000000'
+            with self._lock:
+                self.messages[(params.get('channel'), ts)] = params.get('text')
+            return 200, {'ok': True, 'channel': params.get('channel'), 'ts': ts}
+
+        return 200, {'ok': False, 'error': 'unknown_method'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend-port', type=int, default=8001)
+    parser.add_argument('--slack-port', type=int, default=8002)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Max random seconds added on top')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of failing requests')
+    parser.add_argument('--rate-limit', type=int, default=None, help='Max slack requests per second per method')
+    args = parser.parse_args()
+
+    backend = FakeBackend(Faults(args.latency, args.jitter, args.error_rate), port=args.backend_port).start()
+    fake_slack = FakeSlack(
+        Faults(args.latency, args.jitter, args.error_rate, rate_limit=args.rate_limit), port=args.slack_port
+    ).start()
+    print(f'backend_url={backend.url}')
+    print(f'slack_api_url={fake_slack.api_url}')
+    try:
+        while True:
+            time.sleep(10)
+            print(f'backend calls: {dict(backend.calls)}, slack calls: {dict(fake_slack.calls)}')
+    except KeyboardInterrupt:
+        backend.stop()
+        fake_slack.stop()
+
+
+if __name__ == '__main__':
+    main()
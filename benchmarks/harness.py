@@ -0,0 +1,78 @@
+"""
+Measure latency percentiles and allocations of a callable.
+"""
+import gc
+import time
+import tracemalloc
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(func, iterations=200, warmup=10, allocation_iterations=20):
+    """
+    Call func repeatedly and collect timings
+
+    :param func: Callable without arguments
+    :param iterations: Number of timed calls
+    :param warmup: Number of untimed calls first
+    :param allocation_iterations: Number of calls traced with tracemalloc
+    :return: dict with latency percentiles in microseconds and allocations in bytes per call
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1e6)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    timings.sort()
+
+    peaks, allocated = [], []
+    for _ in range(allocation_iterations):
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        func()
+        after = tracemalloc.take_snapshot()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        allocated.append(sum(stat.size_diff for stat in after.compare_to(before, 'filename') if stat.size_diff > 0))
+
+    return {
+        'iterations': iterations,
+        'p50_us': percentile(timings, 0.50),
+        'p95_us': percentile(timings, 0.95),
+        'p99_us': percentile(timings, 0.99),
+        'mean_us': sum(timings) / len(timings),
+        'peak_bytes': sorted(peaks)[len(peaks) // 2],
+        'retained_bytes': sorted(allocated)[len(allocated) // 2],
+    }
+
+
+def compare(results, baseline, tolerance=0.5):
+    """
+    Compare results against a baseline
+
+    :param results: dict of benchmark name -> measure() result
+    :param baseline: dict in the same format
+    :param tolerance: Allowed relative increase before it counts as a regression
+    :return: list of (name, metric, baseline value, new value) for every regression
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ('p50_us', 'p95_us', 'peak_bytes'):
+            if metric in base and result[metric] > base[metric] * (1 + tolerance):
+                regressions.append((name, metric, base[metric], result[metric]))
+    return regressions
@@ -0,0 +1,187 @@
+"""
+Replay recorded slack traffic against the app in-process with N concurrent clients.
+
+Slash commands and interactive messages are re-signed, given unique ids and
+sent through the chalice test client. The backend and slack are replaced
+by the fakes in benchmarks/fakes.py, so their latency, error rate and rate
+limits can be set. Reports throughput, latency percentiles and the number
+of outbound calls per request:
+
+    python benchmarks/replay.py --clients 10 --requests 50 --latency 0.05
+
+By default the fixtures in tests/test_data.py are replayed. Use --recordings
+with a json list of {"path": "/command" or "/interactive", "body": "..."}
+to replay other traffic.
+"""
+import argparse
+import collections
+import copy
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlencode
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(dir_path))
+
+from benchmarks.fakes import FakeBackend, FakeSlack, Faults  # noqa: E402
+from benchmarks.harness import percentile  # noqa: E402
+from benchmarks.slack_requests import signed_headers, add_confirmation  # noqa: E402
+
+Recording = collections.namedtuple('Recording', ['name', 'path', 'body'])
+
+
+def default_recordings():
+    """
+    The slash commands and interactive message in tests/test_data.py
+    """
+    from tests import test_data
+
+    recordings = [
+        Recording(name, '/command', getattr(test_data, name)['body'].replace('token=faketokenteam_id', 'token=fake&team_id'))
+        for name in ('add', 'list', 'add_today')
+    ]
+    confirmation = add_confirmation(test_data.interactive_message, '2018-12-03', '2018-12-07')
+    recordings.append(Recording('interactive_add', '/interactive', urlencode({'payload': json.dumps(confirmation)})))
+    return recordings
+
+
+def load_recordings(path):
+    with open(path) as fd:
+        return [
+            Recording(recording.get('name', f"{recording['path']}#{number}"), recording['path'], recording['body'])
+            for number, recording in enumerate(json.load(fd))
+        ]
+
+
+def prepare(recording, replay_id, response_url):
+    """
+    Make a recorded body unique and point its response_url at the fake slack
+    """
+    if recording.path == '/interactive':
+        payload = json.loads(parse_qs(recording.body)['payload'][0])
+        payload = copy.deepcopy(payload)
+        payload['action_ts'] = f'{time.time():.6f}.{replay_id}'
+        payload['response_url'] = response_url
+        return urlencode({'payload': json.dumps(payload)})
+
+    data = {key: values[0] for key, values in parse_qs(recording.body).items()}
+    data['trigger_id'] = f'replay.{replay_id}'
+    data['response_url'] = response_url
+    return urlencode(data)
+
+
+def thread_local_requests(chalice_app):
+    """
+    Chalice keeps the current request on the app object. Lambda only runs one
+    request per container at a time, but the replay runs many in one process,
+    so give every client thread its own current_request.
+    """
+    local = threading.local()
+
+    class ThreadLocalChalice(type(chalice_app)):
+        @property
+        def current_request(self):
+            return getattr(local, 'request', None)
+
+        @current_request.setter
+        def current_request(self, request):
+            local.request = request
+
+    chalice_app.__dict__.pop('current_request', None)
+    chalice_app.__class__ = ThreadLocalChalice
+
+
+def run(recordings, clients, requests_per_client, secret, fake_slack):
+    from chalice.test import Client
+    import app
+
+    latencies = collections.defaultdict(list)
+    failures = collections.Counter()
+    lock = threading.Lock()
+    counter = iter(range(10 ** 9))
+
+    def client_loop(client_number):
+        test_client = Client(app.app)
+        for number in range(requests_per_client):
+            recording = recordings[(client_number + number) % len(recordings)]
+            with lock:
+                replay_id = next(counter)
+            body = prepare(recording, replay_id, fake_slack.response_url(recording.name))
+            start = time.perf_counter()
+            response = test_client.http.post(recording.path, headers=signed_headers(body, secret), body=body)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies[recording.name].append(elapsed)
+                if response.status_code != 200 or response.body == b'Slack signing secret not valid':
+                    failures[recording.name] += 1
+
+    threads = [threading.Thread(target=client_loop, args=(number,)) for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if app.worker_queue is not None:
+        app.worker_queue.join()
+    return time.perf_counter() - start, latencies, failures
+
+
+def report(wall_time, latencies, failures, backend, fake_slack):
+    every = sorted(latency for values in latencies.values() for latency in values)
+    total = len(every)
+    outbound = backend.total_calls() + fake_slack.total_calls()
+
+    print(f'requests: {total} in {wall_time:.2f} s ({total / wall_time:.1f} req/s), failures: {sum(failures.values())}')
+    print(f'outbound calls: {outbound} ({outbound / total:.2f} per request)\n')
+    print(f"{'recording':<20} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'failed':>7}")
+    for name, values in sorted(latencies.items()) + [('all', every)]:
+        values = sorted(values)
+        print(
+            f'{name:<20} {len(values):>6} {percentile(values, 0.5) * 1000:>9.1f}'
+            f' {percentile(values, 0.95) * 1000:>9.1f} {percentile(values, 0.99) * 1000:>9.1f}'
+            f' {failures[name] if name != "all" else sum(failures.values()):>7}'
+        )
+    print('\noutbound calls per route:')
+    for route, calls in sorted((backend.calls + fake_slack.calls).items()):
+        print(f'  {calls:>6}  {route}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=10, help='Number of concurrent clients')
+    parser.add_argument('--requests', type=int, default=20, help='Requests per client')
+    parser.add_argument('--recordings', help='json file with recorded requests')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds added to every outbound call')
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int, default=None, help='Max slack calls per second per method')
+    parser.add_argument('--command-mode', choices=('sync', 'deferred'), default=None)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    backend = FakeBackend(Faults(args.latency, args.jitter, args.error_rate)).start()
+    fake_slack = FakeSlack(Faults(args.latency, args.jitter, args.error_rate, rate_limit=args.rate_limit)).start()
+
+    secret = 'replay-secret'
+    os.environ.update(signing_secret=secret, bot_access_token='xoxb-replay',
+                      backend_url=backend.url, slack_api_url=fake_slack.api_url)
+    import app
+    thread_local_requests(app.app)
+    if args.command_mode:
+        app.config['command_mode'] = args.command_mode
+
+    recordings = load_recordings(args.recordings) if args.recordings else default_recordings()
+    try:
+        wall_time, latencies, failures = run(recordings, args.clients, args.requests, secret, fake_slack)
+        report(wall_time, latencies, failures, backend, fake_slack)
+    finally:
+        backend.stop()
+        fake_slack.stop()
+
+
+if __name__ == '__main__':
+    main()
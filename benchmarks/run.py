@@ -0,0 +1,134 @@
+"""
+Benchmarks for the request hot path.
+
+Reports latency percentiles and allocations per benchmark and compares
+them against benchmarks/baseline.json:
+
+    python benchmarks/run.py                   # run and compare
+    python benchmarks/run.py --save-baseline   # run and store a new baseline
+    python benchmarks/run.py -k factory        # only benchmarks matching "factory"
+
+Exits with status 1 if any benchmark regressed more than --tolerance.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(dir_path))
+
+os.environ.setdefault('signing_secret', 'benchmark-secret')
+os.environ.setdefault('bot_access_token', 'xoxb-benchmark')
+os.environ.setdefault('backend_url', 'https://backend.invalid/api')
+
+from benchmarks.harness import measure, compare  # noqa: E402
+from benchmarks.slack_requests import (  # noqa: E402
+    signed_headers, command_body, interactive_body, add_confirmation,
+)
+from benchmarks.stubs import stub_backends  # noqa: E402
+from tests.test_data import interactive_message, fake_request_body  # noqa: E402
+
+baseline_path = os.path.join(dir_path, 'baseline.json')
+
+
+def library_benchmarks():
+    from chalicelib.lib.factory import factory, json_factory
+    from chalicelib.lib.slack import slack_payload_extractor, verify_token, submit_message_menu
+
+    def order(date_str):
+        return {'user_id': ['UFAKE'], 'user_name': ['fake'], 'text': [f'add vab {date_str}']}
+
+    short_order, year_order = order('2019-07-01:2019-07-03'), order('2019-01-01:2019-12-31')
+    short_message = add_confirmation(interactive_message, '2019-07-01', '2019-07-03')
+    year_message = add_confirmation(interactive_message, '2019-01-01', '2019-12-31')
+    interactive_request = interactive_body(interactive_message)
+    headers = {
+        'X-Slack-Request-Timestamp': '1531420618',
+        'X-Slack-Signature': 'v0=a2114d57b48eac39b9ad189dd8316235a7b4a8d21a10bd27519666489c69b503',
+    }
+
+    return {
+        'factory_short_range': lambda: factory(short_order),
+        'factory_year_range': lambda: factory(year_order),
+        'json_factory_short_range': lambda: json_factory(short_message),
+        'json_factory_year_range': lambda: json_factory(year_message),
+        'slack_payload_extractor_interactive': lambda: slack_payload_extractor(interactive_request),
+        'verify_token': lambda: verify_token(headers, fake_request_body, '8f742231b10e8888abcd99yyyzzz85a5'),
+        'submit_message_menu': lambda: submit_message_menu('fake', 'vab', '2019-07-01', '2019-07-31', 8),
+    }
+
+
+def app_benchmarks():
+    from chalice.test import Client
+    import app
+
+    secret = os.environ['signing_secret']
+    test_client = Client(app.app)
+    add_payload = add_confirmation(interactive_message, '2019-07-01', '2019-07-31')
+
+    def post(path, body):
+        response = test_client.http.post(path, headers=signed_headers(body, secret), body=body)
+        assert response.status_code == 200, response.body
+        assert response.body != b'Slack signing secret not valid', path
+        return response
+
+    return {
+        'command_help': lambda: post('/command', command_body('help')),
+        'command_add_range': lambda: post('/command', command_body('add vab 2019-07-01:2019-07-31')),
+        'command_list_month': lambda: post('/command', command_body('list 2019-07')),
+        'interactive_add_month': lambda: post('/interactive', interactive_body(add_payload)),
+    }
+
+
+def format_row(name, result, base=None):
+    row = (
+        f"{name:<38} {result['p50_us']:>10.1f} {result['p95_us']:>10.1f} {result['p99_us']:>10.1f}"
+        f" {result['peak_bytes'] / 1024:>10.1f}"
+    )
+    if base:
+        row += f"  ({result['p50_us'] / base['p50_us']:.2f}x p50)"
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='keyword', help='Only run benchmarks with this in the name')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed relative slowdown')
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as fd:
+            baseline = json.load(fd)
+
+    results = {}
+    print(f"{'benchmark':<38} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'peak KiB':>10}")
+    import app  # noqa: F401  Configures the slack rate limiter, which stub_backends replaces
+    with stub_backends(list_data='[{"event_date": "2019-07-01", "reason": "vab", "hours": 8}]'):
+        benchmarks = dict(library_benchmarks(), **app_benchmarks())
+        for name, func in benchmarks.items():
+            if args.keyword and args.keyword not in name:
+                continue
+            results[name] = measure(func, iterations=args.iterations)
+            print(format_row(name, results[name], baseline.get(name)))
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(baseline_path, 'w') as fd:
+            json.dump(baseline, fd, indent=2, sort_keys=True)
+        print(f'\nSaved baseline to {baseline_path}')
+        return 0
+
+    regressions = compare(results, baseline, tolerance=args.tolerance)
+    for name, metric, base, new in regressions:
+        print(f'REGRESSION {name} {metric}: {base:.1f} -> {new:.1f}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
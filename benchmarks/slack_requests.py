@@ -0,0 +1,67 @@
+"""
+Build signed slack requests like the ones slack sends to /command and /interactive.
+"""
+import copy
+import hashlib
+import hmac
+import itertools
+import json
+import time
+from urllib.parse import urlencode
+
+_counter = itertools.count()
+
+
+def signed_headers(body, signing_secret):
+    """
+    Headers for body, signed with signing_secret and the current time
+    """
+    timestamp = str(int(time.time()))
+    basestring = f'v0:{timestamp}:{body}'.encode('utf-8')
+    return {
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'X-Slack-Request-Timestamp': timestamp,
+        'X-Slack-Signature': f'v0={hmac.new(signing_secret.encode("utf-8"), basestring, hashlib.sha256).hexdigest()}',
+    }
+
+
+def command_body(text, user_id='UFAKE', user_name='fake', response_url='https://hooks.slack.com/commands/fake'):
+    """
+    A slash command body. Every body gets a unique trigger_id so the
+    signatures never repeat, like real slack traffic.
+    """
+    return urlencode({
+        'token': 'fake',
+        'team_id': 'TFAKE',
+        'channel_id': 'CFAKE',
+        'user_id': user_id,
+        'user_name': user_name,
+        'command': '/timereport',
+        'text': text,
+        'response_url': response_url,
+        'trigger_id': f'{next(_counter)}.fake',
+    })
+
+
+def interactive_body(payload):
+    """
+    An interactive message body with a unique action_ts
+    """
+    payload = copy.deepcopy(payload)
+    payload['action_ts'] = f'{time.time():.6f}.{next(_counter)}'
+    return urlencode({'payload': json.dumps(payload)})
+
+
+def add_confirmation(payload, date_start, date_end, hours='8', reason='vab'):
+    """
+    Turn a recorded interactive message into a confirmed add of a date range
+    """
+    payload = copy.deepcopy(payload)
+    payload['callback_id'] = 'add'
+    payload['actions'] = [{'name': 'submit', 'type': 'button', 'value': 'submit_yes'}]
+    fields = payload['original_message']['attachments'][0]['fields']
+    fields[1]['value'] = reason
+    fields[2]['value'] = date_start
+    fields[3]['value'] = date_end
+    fields[4]['value'] = hours
+    return payload
@@ -0,0 +1,69 @@
+"""
+Stand-ins for the backend and the slack API, so the app can run in-process
+without network access.
+"""
+import contextlib
+import json
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class OutboundCounter:
+    def __init__(self):
+        self.calls = 0
+
+    def reset(self):
+        self.calls = 0
+
+
+@contextlib.contextmanager
+def stub_backends(list_data='[]', counter=None):
+    """
+    Replace the shared HTTP client and the slack WebClient with canned responses.
+    Import app before entering, since importing it configures a new slack rate limiter.
+
+    :param list_data: Response text for list queries
+    :param counter: Optional OutboundCounter counting every outbound call
+    """
+    import slack
+    from chalicelib.lib import client
+    from chalicelib.lib import slack as slack_lib
+    from chalicelib.lib.ratelimit import RateLimiter, SLACK_RATE_LIMITS
+
+    counter = counter or OutboundCounter()
+
+    def fake_request(method, url, **kwargs):
+        counter.calls += 1
+        if method == 'get':
+            return FakeResponse(text=list_data)
+        return FakeResponse(text='{"ok": true, "ts": "1.0"}')
+
+    def fake_api_call(self, api_method, **kwargs):
+        counter.calls += 1
+        return {'ok': True, 'channel': {'id': 'DFAKE'}, 'already_open': True, 'ts': '1.0'}
+
+    # The stubbed slack has no rate limits, and benchmarks send far more messages
+    # than a user would. The limiter still runs, it just never has to wait.
+    unlimited = (10 ** 9, 10 ** 9)
+    original_rate_limiter = slack_lib.rate_limiter
+    original_request = client.request
+    original_api_call = slack.WebClient.api_call
+    slack_lib.rate_limiter = RateLimiter(
+        limits={method: unlimited for method in SLACK_RATE_LIMITS}, default=unlimited
+    )
+    client.request = fake_request
+    slack.WebClient.api_call = fake_api_call
+    try:
+        yield counter
+    finally:
+        slack_lib.rate_limiter = original_rate_limiter
+        client.request = original_request
+        slack.WebClient.api_call = original_api_call
@@ -0,0 +1,97 @@
+"""
+The slash commands, e.g. /timereport add.
+
+Every command is a module with a run(action) function, imported the first
+time the command is used. A cold start only pays for the imports of the
+command actually run.
+"""
+import collections
+import importlib
+import logging
+import threading
+import time
+
+from chalicelib.lib import timing
+
+log = logging.getLogger(__name__)
+
+# Command name -> module with the handler
+commands = {
+    'add': 'chalicelib.commands.add',
+    'delete': 'chalicelib.commands.delete',
+    'edit': 'chalicelib.commands.edit',
+    'export': 'chalicelib.commands.export',
+    'help': 'chalicelib.commands.help',
+    'list': 'chalicelib.commands.list',
+    'lock': 'chalicelib.commands.lock',
+    'team': 'chalicelib.commands.team',
+}
+
+_handlers = {}
+_stats = collections.defaultdict(collections.Counter)
+_lock = threading.Lock()
+
+
+def register(name, module):
+    """
+    Add a command, or replace the handler of one
+
+    :param name: The command name, the first word after the slash command
+    :param module: Import path of a module with a run(action) function
+    """
+    with _lock:
+        commands[name] = module
+        _handlers.pop(name, None)
+
+
+def get_handler(name):
+    """
+    Get the handler of a command, importing it on first use
+
+    :param name: The command name
+    :return: The run function of the command, or None for unknown commands
+    """
+    handler = _handlers.get(name)
+    if handler is not None:
+        return handler
+
+    module = commands.get(name)
+    if module is None:
+        return None
+
+    start = time.perf_counter()
+    handler = importlib.import_module(module).run
+    log.debug(f"Loaded command {name} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    with _lock:
+        _handlers[name] = handler
+    return handler
+
+
+def run(name, handler, action):
+    """
+    Run a command handler, counting calls, errors and time spent per command
+    """
+    start = time.perf_counter()
+    try:
+        with timing.span(f"action.{name}"):
+            return handler(action)
+    except Exception:
+        _count(name, 'errors')
+        log.exception(f"Command {name} failed")
+        raise
+    finally:
+        _count(name, 'calls')
+        _count(name, 'ms', (time.perf_counter() - start) * 1000)
+
+
+def _count(name, key, value=1):
+    with _lock:
+        _stats[name][key] += value
+
+
+def stats():
+    """
+    :return: dict of command -> calls, errors and total ms
+    """
+    with _lock:
+        return {name: dict(counter) for name, counter in _stats.items()}
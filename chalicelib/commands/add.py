@@ -0,0 +1,50 @@
+import logging
+from chalicelib.lib.factory import factory
+from chalicelib.lib.slack import submit_message_menu
+
+log = logging.getLogger(__name__)
+
+
+def run(action):
+    """
+    /timereport add vab 2019-01-01:2019-01-05
+    """
+    events = factory(
+        action.payload,
+        working_days_only=action.config.get('working_days_only', False),
+        calendar=action.config.get('holiday_calendar', 'se'),
+        extra_holidays=action.config.get('extra_holidays') or (),
+    )
+    if events is False:
+        return action.send_response(message="Wrong arguments for add command")
+    if not events:
+        # The arguments were valid but working_days_only skipped every day
+        return action.send_response(message=f"No working days to add in {action.params[2]}")
+
+    log.info(f"Events is: {events}")
+    user_name = events[0].user_name[0]
+    reason = events[0].reason
+
+    if not reason in action.config.get('valid_reasons'):
+        message = f"Reason {reason} is not valid"
+        log.debug(message)
+        action.send_response(message=message)
+        return ""
+
+    action.date_start = events[0].event_date
+    action.date_end = events[-1].event_date
+    hours = events[0].hours
+
+    locked = action.check_lock_state()
+    if locked is None:
+        action.send_response(message="Could not verify the lock state of the events, please try again later")
+        return ""
+    if locked:
+        action.send_response(message="One or more of the events are locked")
+        return ""
+
+    action.send_attachment(attachment=submit_message_menu(
+        user_name, reason,
+        action.date_start, action.date_end, hours)
+    )
+    return ""
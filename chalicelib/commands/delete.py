@@ -0,0 +1,29 @@
+import logging
+from chalicelib.lib.slack import delete_message_menu
+from chalicelib.lib.dates import resolve_strings
+
+log = logging.getLogger(__name__)
+
+
+def run(action):
+    """
+    /timereport delete 2019-01-01
+
+    Months, years and ranges are resolved before asking, so the
+    confirmation shows the first and last date that will be deleted.
+    """
+    if len(action.params) < 2:
+        action.send_response(message="Usage: /timereport delete <date>, e.g. 2019-01-01")
+        return ""
+
+    date_str = action.params[1]
+    try:
+        date_start, date_end = resolve_strings(date_str)
+    except ValueError:
+        log.debug(f"Invalid date to delete: {date_str}", exc_info=True)
+        action.send_response(message=f"Sorry, {date_str} is not a valid date")
+        return ""
+
+    date = date_start if date_start == date_end else f"{date_start}:{date_end}"
+    action.send_attachment(attachment=delete_message_menu(action.payload.get("user_name")[0], date))
+    return ""
@@ -0,0 +1,2 @@
+def run(action):
+    return action.send_response(message="Edit not implemented yet")
@@ -0,0 +1,54 @@
+import logging
+import os
+from datetime import datetime
+from chalicelib.lib.dates import resolve_strings
+from chalicelib.lib.export import export, ExportError, EXPORT_FORMATS
+
+log = logging.getLogger(__name__)
+
+
+def run(action):
+    """
+    Export timereport for user to a file, uploaded to the direct message channel.
+    If no range is supplied it will default to the current year.
+
+    /timereport export 2019
+    /timereport export 2019-01:2019-06 json
+    """
+    arguments = [argument for argument in action.params[1:] if argument not in EXPORT_FORMATS]
+    export_format = next((argument for argument in action.params[1:] if argument in EXPORT_FORMATS), 'csv')
+    date_str = arguments[0] if arguments else datetime.now().strftime("%Y")
+
+    try:
+        resolve_strings(date_str)
+    except ValueError:
+        log.debug(f"Invalid export range {date_str}", exc_info=True)
+        return action.send_response(message=f"Sorry, {date_str} is not a valid date range")
+
+    try:
+        path, count = export(
+            action.config['backend_url'],
+            action.user_id,
+            date_str,
+            export_format=export_format,
+            directory=action.config.get('export_directory'),
+            max_workers=action.config.get('export_max_workers', 4),
+        )
+    except ExportError as error:
+        log.info(f"Export of {date_str} for {action.user_id} failed: {error}")
+        return action.send_response(message=f"Export failed: {error}")
+
+    try:
+        if not count:
+            return action.send_response(message=f"Sorry, nothing to export for {date_str}")
+
+        if not action.slack.slack_dm_channel:
+            action.slack.open_conversation(slack_user_id=action.user_id)
+        action.slack.upload_file(
+            path,
+            filename=f"timereport_{date_str.replace(':', '_')}.{export_format}",
+            comment=f"{count} events for {date_str}",
+        )
+        return ""
+    finally:
+        os.remove(path)
@@ -0,0 +1,2 @@
+def run(action):
+    return action.send_response(message=f"{action.perform_action.__doc__}")
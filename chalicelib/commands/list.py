@@ -0,0 +1,56 @@
+import logging
+from datetime import datetime
+from chalicelib.lib.list import get_list_data, cache_stats
+from chalicelib.lib.report import summarize, render_summary, render_detail
+from chalicelib.model.event import iter_events
+
+log = logging.getLogger(__name__)
+
+
+def run(action):
+    """
+    List timereport for user.
+    If no arguments supplied it will default to the current month.
+
+    Supported arguments:
+    "today" - List the event for the todays date
+    "date" - The date as a string.
+    "detail" - List every event instead of a summary
+    """
+    arguments = [argument for argument in action.params[1:] if argument != "detail"]
+    detail = len(arguments) != len(action.params[1:])
+
+    log.debug(f"Got arguments: {arguments}")
+    if arguments:
+        date_str = arguments[0]
+    else:
+        date_str = datetime.now().strftime("%Y-%m")
+
+    log.debug(f"The date string set to: {date_str}")
+    list_data = get_list_data(f"{action.config['backend_url']}", action.user_id, date_str=date_str)
+    log.info(f"List cache stats: {cache_stats()}")
+
+    if not list_data or list_data == '[]':
+        log.debug(f"List returned nothing. Date string was: {date_str}")
+        action.send_response(message=f"Sorry, nothing to list with supplied argument {arguments}")
+        return ""
+
+    try:
+        records = list(iter_events(list_data))
+    except ValueError as error:
+        log.debug(f"Failed to parse list data: {list_data}", exc_info=True)
+        action.send_response(message=f"Got unexpected list data from backend")
+        return ""
+
+    if detail:
+        message = render_detail(records)
+    else:
+        summary = summarize(records)
+        if not summary['days']:
+            log.debug(f"No events with a valid date in list data: {list_data}")
+            action.send_response(message="Got unexpected list data from backend")
+            return ""
+        message = render_summary(summary)
+
+    action.send_response(message=message)
+    return ""
@@ -0,0 +1,32 @@
+import json
+import logging
+from chalicelib.lib.list import invalidate
+from chalicelib.lib.lock import lock_event, mark_locked
+from chalicelib.model.event import create_lock
+
+log = logging.getLogger(__name__)
+
+
+def run(action):
+    """
+    /timereport-dev lock 2019-08
+    """
+    if len(action.params) < 2:
+        action.send_response(message="Usage: /timereport lock <month>, e.g. 2019-08")
+        return ""
+
+    event = create_lock(user_id=action.user_id, event_date=action.params[1])
+    if not event:
+        action.send_response(message=f"Sorry, {action.params[1]} is not a month. Usage: /timereport lock 2019-08")
+        return ""
+    log.debug(f"lock event: {event}")
+    response = lock_event(url=action.config['backend_url'], event=json.dumps(event))
+    log.debug(f"response was: {response.text}")
+    if response.status_code == 200:
+        mark_locked(action.user_id, event['event_date'])
+        invalidate(action.user_id, [event['event_date']])
+        action.send_response(message=f"Lock successful! :lock: :+1:")
+        return ""
+    else:
+        action.send_response(message=f"Lock failed! :cry:")
+        return ""
@@ -0,0 +1,95 @@
+import logging
+import re
+import time
+from datetime import datetime
+from chalicelib.lib.dates import resolve
+from chalicelib.lib.holidays import working_days
+from chalicelib.lib.ratelimit import RateLimited
+from chalicelib.lib.report import summarize_team, render_team
+from chalicelib.lib.team import fetch_team
+
+log = logging.getLogger(__name__)
+
+# Slack escapes channels in slash commands as <#C024BE7LR|general>
+CHANNEL_PATTERN = re.compile(r'^<#([CG][A-Z0-9]+)(\|[^>]*)?>$|^([CG][A-Z0-9]{6,})$')
+
+# Slackbot is not flagged as a bot by users.info
+SLACKBOT_USER_ID = 'USLACKBOT'
+
+
+def team_members(action, channel, deadline=None):
+    """
+    The users to report on: the members of channel if one was given, then the
+    team_members of the config, then the members of the channel the command was sent in.
+    Bots and deactivated users are left out of channel members.
+
+    :deadline: time.monotonic() value after which users.list isn't read any further
+    """
+    if not channel and action.config.get('team_members'):
+        return list(action.config['team_members'])
+    channel = channel or (action.payload.get('channel_id') or [None])[0]
+    if not channel:
+        return []
+    members = action.slack.api.channel_members(channel)
+    non_persons = action.slack.api.non_person_ids(deadline=deadline)
+    return [user_id for user_id in members if user_id != SLACKBOT_USER_ID and user_id not in non_persons]
+
+
+def run(action):
+    """
+    Summary of a month for the whole team, with the users missing working days.
+
+    /timereport team
+    /timereport team 2019-01
+    /timereport team 2019-01 #channel
+    """
+    # Imported here since slackclient is slow to import
+    from slack.errors import SlackApiError
+
+    if action.user_id not in (action.config.get('team_managers') or ()):
+        log.info(f"User {action.user_id} is not allowed to see the team report")
+        return action.send_response(message="Sorry, only team managers can see the team report")
+
+    channel, date_str = None, datetime.now().strftime("%Y-%m")
+    for argument in action.params[1:]:
+        match = CHANNEL_PATTERN.match(argument)
+        if match:
+            channel = match.group(1) or match.group(3)
+        else:
+            date_str = argument
+
+    try:
+        start, end = resolve(date_str)
+    except ValueError:
+        return action.send_response(message=f"Sorry, {date_str} is not a valid date range")
+
+    # The member lookup counts against the budget of the report
+    started = time.monotonic()
+    budget = action.config.get('team_report_budget', 20)
+    try:
+        user_ids = team_members(action, channel, deadline=started + budget)
+    except (SlackApiError, RateLimited) as error:
+        log.info(f"Failed to get members of channel {channel}: {error}")
+        return action.send_response(message="Sorry, I could not get the members of that channel")
+    if not user_ids:
+        return action.send_response(message="Sorry, found no users to report on")
+
+    results, skipped = fetch_team(
+        action.config['backend_url'],
+        user_ids,
+        date_str,
+        max_workers=action.config.get('team_max_workers', 16),
+        budget=budget,
+        started=started,
+    )
+    # Days after today are not missing yet
+    expected_days = [
+        day.isoformat() for day in working_days(
+            start,
+            min(end, datetime.now().date()),
+            calendar=action.config.get('holiday_calendar', 'se'),
+            extra_holidays=action.config.get('extra_holidays') or (),
+        )
+    ]
+    summary = summarize_team(results + [(user_id, None) for user_id in skipped], expected_days)
+    return action.send_response(message=render_team(summary, date_str))
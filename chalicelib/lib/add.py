@@ -1,17 +1,94 @@
-import botocore.vendored.requests.api as requests
+from . import client
 import logging
+from .dispatch import fan_out
+from .timing import timed, span
+from ..model.event import Event, events_to_json
 
 log = logging.getLogger(__name__)
 
+# Status codes of a backend rejecting a list body, e.g. an endpoint expecting one object.
+# Auth failures and 429 are not about the body, and posting one event at a time would only add load
+BATCH_UNSUPPORTED = (400, 404, 405, 415, 422, 501)
+
+
+def batch_unsupported(status_code):
+    """
+    If a status code tells us the backend doesn't accept batches
+    """
+    return status_code in BATCH_UNSUPPORTED
+
+
+@timed('post_event')
 def post_event(url, data):
     """
     Add event
 
     url: URL to backend API
-    data: A dict with the event to add
+    data: The event to add, as an Event or a json string
     
     :return: requests response object
     """
+    if isinstance(data, Event):
+        data = data.to_json()
     headers = {'Content-Type': 'application/json'}
-    res = requests.post(url=url, json=data, headers=headers)
+    res = client.post(url=url, json=data, headers=headers)
     return res
+
+
+def post_events(url, events, chunk_size=31, max_workers=8):
+    """
+    Add several events using batched requests
+
+    The events are sent as a list, chunk_size events per request.
+    Falls back to one request per event if the backend doesn't support batches.
+
+    url: URL to backend API
+    events: A list of Event to add
+    chunk_size: Max number of events in one request
+    max_workers: Max number of concurrent requests when posting one event at a time
+
+    :return: list with the event dates that failed
+    """
+    headers = {'Content-Type': 'application/json'}
+    failed_events = []
+    batch_supported = True
+
+    for start in range(0, len(events), chunk_size):
+        chunk = events[start:start + chunk_size]
+
+        if batch_supported:
+            with span('post_events_batch') as batch_span:
+                res = client.post(url=url, json=events_to_json(chunk), headers=headers)
+                batch_span['status'] = res.status_code
+            if res.status_code == 200:
+                continue
+            if not batch_unsupported(res.status_code):
+                log.debug(f"Batch of {len(chunk)} events got unexpected response from backend: {res.text}")
+                failed_events.extend(event.event_date for event in chunk)
+                continue
+            log.info(f"Backend doesn't support batches (status code {res.status_code}). Posting one event at a time")
+            batch_supported = False
+
+        failed_events.extend(post_each(url, chunk, max_workers=max_workers))
+
+    return failed_events
+
+
+def post_each(url, events, max_workers=8):
+    """
+    Add several events concurrently, one request per event
+
+    url: URL to backend API
+    events: A list of Event to add
+    max_workers: Max number of concurrent requests
+
+    :return: list with the event dates that failed
+    """
+    failed_events = []
+    for result in fan_out(lambda event: post_event(url, event), events, max_workers=max_workers):
+        if result.error or result.value.status_code != 200:
+            log.debug(
+                f"Event {result.item} got unexpected response from backend: {result.error or result.value.text}"
+            )
+            failed_events.append(result.item.event_date)
+    return failed_events
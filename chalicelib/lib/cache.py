@@ -0,0 +1,158 @@
+from collections import OrderedDict
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+_missing = object()
+
+
+class TTLCache:
+    """
+    A thread safe LRU cache where entries also expire after ttl seconds
+
+    Meant to live at module scope so warm lambda invocations can reuse it.
+    """
+
+    def __init__(self, maxsize=128, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """
+        Get a value from the cache
+
+        :key: The key to look up
+        :default: Returned if the key is missing or expired
+        """
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if expires <= self.clock():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Add a value to the cache, evicting the least recently used entry if full
+
+        :key: The key
+        :value: The value
+        :ttl: Seconds until the entry expires. Defaults to the cache ttl
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        Get the cache counters
+
+        :return: dict
+        """
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class FileCache(TTLCache):
+    """
+    A TTLCache that is also written to a json file.
+
+    Keys must be strings. Point path at /tmp to survive container reuse,
+    or at a mounted file system to share between containers.
+    """
+
+    def __init__(self, path, maxsize=128, ttl=300):
+        super().__init__(maxsize=maxsize, ttl=ttl, clock=time.time)
+        self.path = path
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as fd:
+                entries = json.load(fd)
+        except (OSError, ValueError) as error:
+            log.debug(f"Could not load cache file {self.path}: {error}")
+            return
+
+        now = self.clock()
+        for key, (expires, value) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if expires > now:
+                self._data[key] = (expires, value)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as fd:
+                json.dump({key: list(entry) for key, entry in self._data.items()}, fd)
+            os.replace(tmp_path, self.path)
+        except OSError as error:
+            log.debug(f"Could not write cache file {self.path}: {error}")
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            super().set(key, value, ttl=ttl)
+            self._save()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = super().pop(key, default)
+            self._save()
+        return value
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._save()
+
@@ -0,0 +1,229 @@
+from botocore.vendored import requests
+from urllib.parse import urlparse
+import logging
+import random
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Shared by every request made from this process. Lives at module scope so
+# warm lambda invocations reuse the open connections.
+_session = None
+_session_lock = threading.Lock()
+_settings = {
+    'pool_connections': 10,
+    'pool_maxsize': 10,
+    'timeout': 10,
+    'host_timeouts': {},
+    'retry_attempts': 3,
+    'retry_backoff': 0.1,
+    'retry_max_backoff': 2.0,
+    'failure_threshold': 5,
+    'reset_timeout': 30,
+}
+
+# Responses with these status codes are retried for idempotent requests
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def configure(pool_connections=None, pool_maxsize=None, timeout=None, host_timeouts=None,
+              retry_attempts=None, retry_backoff=None, retry_max_backoff=None,
+              failure_threshold=None, reset_timeout=None):
+    """
+    Configure the shared HTTP session
+
+    :param pool_connections: Number of hosts to keep connection pools for
+    :param pool_maxsize: Max number of kept-alive connections per host
+    :param timeout: Default timeout in seconds for every request
+    :param host_timeouts: dict of host -> timeout in seconds, overriding timeout
+    :param retry_attempts: Max attempts for idempotent requests
+    :param retry_backoff: Base delay in seconds between attempts. Doubled for every attempt, with jitter
+    :param retry_max_backoff: Max delay in seconds between attempts
+    :param failure_threshold: Consecutive failures before the circuit for a host opens
+    :param reset_timeout: Seconds an open circuit waits before letting a trial request through
+    """
+    global _session
+    new_settings = dict(_settings)
+    for key, value in (
+        ('pool_connections', pool_connections), ('pool_maxsize', pool_maxsize), ('timeout', timeout),
+        ('host_timeouts', host_timeouts), ('retry_attempts', retry_attempts), ('retry_backoff', retry_backoff),
+        ('retry_max_backoff', retry_max_backoff), ('failure_threshold', failure_threshold),
+        ('reset_timeout', reset_timeout),
+    ):
+        if value is not None:
+            new_settings[key] = value
+
+    with _session_lock:
+        if _session is not None and (
+            new_settings['pool_connections'] != _settings['pool_connections']
+            or new_settings['pool_maxsize'] != _settings['pool_maxsize']
+        ):
+            log.debug("Pool settings changed. Closing the current session")
+            _session.close()
+            _session = None
+        _settings.update(new_settings)
+    with _breakers_lock:
+        _breakers.clear()
+
+
+class CircuitBreaker:
+    """
+    Fail fast for a host that keeps failing
+
+    Opens after failure_threshold consecutive failures. While open every
+    request fails without being sent. After reset_timeout seconds one trial
+    request is let through, and its result closes or reopens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        """
+        :return: True if a request may be sent
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial_running or self.clock() - self.opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._trial_running = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(host):
+    """
+    The circuit breaker for a host
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(_settings['failure_threshold'], _settings['reset_timeout'])
+        return breaker
+
+
+def unavailable_response(url, reason):
+    """
+    A 503 response for requests that were never sent
+    """
+    response = requests.models.Response()
+    response.status_code = 503
+    response.reason = 'Service Unavailable'
+    response.url = url
+    response.encoding = 'utf-8'
+    response._content = reason.encode('utf-8')
+    return response
+
+
+def backoff_delay(attempt):
+    """
+    Seconds to wait before retry number attempt (1 for the first retry), with full jitter
+    """
+    ceiling = min(_settings['retry_max_backoff'], _settings['retry_backoff'] * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+def get_session():
+    """
+    Get the shared HTTP session, creating it on first use
+
+    :return: requests session object
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=_settings['pool_connections'],
+                    pool_maxsize=_settings['pool_maxsize'],
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def request(method, url, idempotent=None, **kwargs):
+    """
+    Send a request using the shared session
+
+    Idempotent requests are retried with jittered exponential backoff on
+    connection errors, timeouts and 429/5xx responses. Requests to a host
+    whose circuit is open get a 503 response without being sent.
+
+    :param method: The HTTP method
+    :param url: The URL
+    :param idempotent: If the request is safe to retry. Defaults to True for get and delete
+    :param kwargs: Passed on to requests. timeout defaults to the configured timeout for the host
+    :return: requests response object
+    """
+    host = urlparse(url).netloc
+    if idempotent is None:
+        idempotent = method.lower() in ('get', 'delete')
+    kwargs.setdefault('timeout', _settings['host_timeouts'].get(host, _settings['timeout']))
+    attempts = _settings['retry_attempts'] if idempotent else 1
+    breaker = get_breaker(host)
+
+    for attempt in range(1, attempts + 1):
+        if not breaker.allow():
+            log.info(f"Circuit open for {host}. Not sending {method} {url}")
+            return unavailable_response(url, f"Circuit open for {host}")
+
+        try:
+            response = get_session().request(method=method, url=url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+            breaker.record_failure()
+            if attempt == attempts:
+                raise
+            log.debug(f"Attempt {attempt} of {method} {url} failed: {error}")
+        else:
+            if response.status_code < 500:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+            if response.status_code not in RETRY_STATUS_CODES or attempt == attempts:
+                return response
+            log.debug(f"Attempt {attempt} of {method} {url} got status code {response.status_code}")
+
+        time.sleep(backoff_delay(attempt))
+
+
+def get(url, params=None, **kwargs):
+    return request('get', url, params=params, **kwargs)
+
+
+def post(url, data=None, json=None, **kwargs):
+    return request('post', url, data=data, json=json, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request('delete', url, **kwargs)
@@ -0,0 +1,85 @@
+from calendar import monthrange
+from datetime import datetime
+from functools import lru_cache
+import logging
+
+log = logging.getLogger(__name__)
+
+DATE_FORMAT = "%Y-%m-%d"
+MONTH_FORMAT = "%Y-%m"
+
+
+def resolve(date_str, today=None):
+    """
+    Resolve a date string to the first and last date it covers
+
+    Supported formats:
+    "today" - Todays date
+    "2019" - The whole year
+    "2019-01" - The whole month, using the real length of the month
+    "2019-01-01" - The date
+    "2019-01-01:2019-02" - From the start of the first to the end of the second part
+
+    :param date_str: The date string
+    :param today: The date to use for "today". Defaults to the current date
+    :return: tuple with two datetime.date objects
+    :raises ValueError: If the date string isn't valid
+    """
+    if ":" in date_str:
+        start_str, end_str = date_str.split(":")
+        start = resolve(start_str, today)[0]
+        end = resolve(end_str, today)[1]
+        if start > end:
+            raise ValueError(f"Start of {date_str} is after the end")
+        return start, end
+
+    if date_str == "today":
+        today = today or datetime.now().date()
+        return today, today
+
+    return _parse(date_str)
+
+
+def resolve_strings(date_str, today=None):
+    """
+    Like resolve but returns the dates as strings (2019-01-01)
+    """
+    start, end = resolve(date_str, today)
+    return start.strftime(DATE_FORMAT), end.strftime(DATE_FORMAT)
+
+
+@lru_cache(maxsize=1024)
+def _parse(date_str):
+    if len(date_str) == 4 and date_str.isdigit():
+        year = datetime.strptime(date_str, "%Y").date()
+        return year, year.replace(month=12, day=31)
+
+    if len(date_str.split("-")) == 2:
+        month = datetime.strptime(date_str, MONTH_FORMAT).date()
+        return month, month.replace(day=monthrange(month.year, month.month)[1])
+
+    day = datetime.strptime(date_str, DATE_FORMAT).date()
+    return day, day
+
+
+def iter_months(date_start, date_end):
+    """
+    The months touched by a date range, one at a time
+
+    date_start: The first date, as a date or a string (2019-01-30)
+    date_end: The last date, as a date or a string (2019-03-01)
+    :return: generator of months as strings (2019-01, 2019-02, 2019-03)
+    """
+    start = datetime.strptime(str(date_start)[:7], MONTH_FORMAT)
+    end = datetime.strptime(str(date_end)[:7], MONTH_FORMAT)
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield f"{year:04d}-{month:02d}"
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def months_in_range(date_start, date_end):
+    """
+    Like iter_months but returns a list
+    """
+    return list(iter_months(date_start, date_end))
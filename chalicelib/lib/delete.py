@@ -1,8 +1,11 @@
-import botocore.vendored.requests.api as requests
+from . import client
 import logging
+from .dispatch import fan_out
+from .timing import timed
 
 log = logging.getLogger(__name__)
 
+@timed('delete_event')
 def delete_event(url, date):
     """
     Delete event for user
@@ -12,5 +15,22 @@ def delete_event(url, date):
     :return:
     """
     params = {'date': date}
-    res = requests.delete(url=url, params=params)
-    return res
\ No newline at end of file
+    res = client.delete(url=url, params=params)
+    return res
+
+
+def delete_events(url, dates, max_workers=8):
+    """
+    Delete several events for user concurrently
+
+    URL: URL to backend API
+    dates: List of dates to delete as strings (2019-01-01)
+    max_workers: Max number of concurrent requests
+    :return: list with the dates that failed
+    """
+    failed_dates = []
+    for result in fan_out(lambda date: delete_event(url, date), dates, max_workers=max_workers):
+        if result.error or result.value.status_code != 200:
+            log.debug(f"Delete of {result.item} failed: {result.error or result.value.text}")
+            failed_dates.append(result.item)
+    return failed_dates
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import namedtuple
+import logging
+from . import timing
+
+log = logging.getLogger(__name__)
+
+Result = namedtuple('Result', ['item', 'value', 'error'])
+
+
+def fan_out(func, items, max_workers=8):
+    """
+    Call func once for every item using a bounded thread pool
+
+    :param func: The function to call with each item
+    :param items: The items to hand to func
+    :param max_workers: Max number of concurrent calls
+    :return: list of Result in the same order as items.
+             error is the raised exception, or None if the call succeeded
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    recorder = timing.current()
+
+    def call(item):
+        timing.activate(recorder)
+        try:
+            return Result(item, func(item), None)
+        except Exception as error:
+            log.debug(f"Call with {item} raised: {error}", exc_info=True)
+            return Result(item, None, error)
+
+    if max_workers <= 1 or len(items) == 1:
+        return [call(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(call, items))
@@ -0,0 +1,135 @@
+import csv
+import logging
+import os
+import tempfile
+from .dates import resolve_strings, iter_months
+from .dispatch import fan_out
+from .list import get_list_data
+from ..model.event import iter_events
+
+log = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('csv', 'json')
+
+# Columns of csv exports
+FIELDS = ('user_id', 'user_name', 'event_date', 'reason', 'hours', 'lock')
+
+
+class ExportError(Exception):
+    pass
+
+
+def fetch_months(url, user_id, months, max_workers=4):
+    """
+    Fetch months from the backend, max_workers months at a time
+
+    Only one window of months is held in memory. The next window is fetched
+    when the previous one has been consumed. The months bypass the list cache.
+
+    :param url: The URL to the backend API
+    :param user_id: The users user ID
+    :param months: Iterable of months as strings (2019-01)
+    :param max_workers: Max number of months fetched at once
+    :return: generator of (month, list data) in month order
+    :raises ExportError: If a month could not be fetched
+    """
+    months = iter(months)
+    while True:
+        window = [month for _, month in zip(range(max_workers), months)]
+        if not window:
+            return
+        fetch = lambda month: get_list_data(url, user_id, month, cache=False)
+        for result in fan_out(fetch, window, max_workers):
+            if result.error is not None or result.value is False:
+                raise ExportError(f"Failed to fetch {result.item} from backend")
+            yield result.item, result.value
+
+
+def iter_records(url, user_id, date_str, max_workers=4):
+    """
+    The events of a user in a date range, one month at a time
+
+    :param url: The URL to the backend API
+    :param user_id: The users user ID
+    :param date_str: The range. Valid formats are the ones of dates.resolve
+    :param max_workers: Max number of months fetched at once
+    :return: generator of Event in date order
+    :raises ValueError: If the date string isn't valid
+    :raises ExportError: If a month could not be fetched or parsed
+    """
+    start, end = resolve_strings(date_str)
+    for month, list_data in fetch_months(url, user_id, iter_months(start, end), max_workers):
+        try:
+            events = sorted(iter_events(list_data), key=lambda event: event.event_date)
+        except ValueError as error:
+            log.debug(f"Failed to parse list data for {month}: {list_data}", exc_info=True)
+            raise ExportError(f"Got unexpected data from backend for {month}") from error
+        for event in events:
+            # The first and last month may only be partly in the range
+            if start <= event.event_date <= end:
+                yield event
+
+
+def write_csv(events, fd):
+    """
+    Write events as csv rows
+
+    :return: Number of events written
+    """
+    writer = csv.DictWriter(fd, fieldnames=FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for count, event in enumerate(events, 1):
+        writer.writerow(event.to_dict())
+    return count
+
+
+def write_json(events, fd):
+    """
+    Write events as a json list, one event at a time
+
+    :return: Number of events written
+    """
+    fd.write('[')
+    count = 0
+    for count, event in enumerate(events, 1):
+        if count > 1:
+            fd.write(',\n')
+        fd.write(event.to_json())
+    fd.write(']\n')
+    return count
+
+
+writers = {'csv': write_csv, 'json': write_json}
+
+
+def export(url, user_id, date_str, export_format='csv', directory=None, max_workers=4):
+    """
+    Export the events of a user in a date range to a file
+
+    The events are streamed from the backend to the file, so memory use does
+    not grow with the length of the range.
+
+    :param url: The URL to the backend API
+    :param user_id: The users user ID
+    :param date_str: The range. Valid formats are the ones of dates.resolve
+    :param export_format: csv or json
+    :param directory: Directory to write the file in. Defaults to the temp directory
+    :param max_workers: Max number of months fetched at once
+    :return: tuple of the file path and the number of events written
+    :raises ValueError: If the date string or format isn't valid
+    :raises ExportError: If a month could not be fetched or parsed
+    """
+    if export_format not in writers:
+        raise ValueError(f"Unsupported export format {export_format}")
+    records = iter_records(url, user_id, date_str, max_workers)
+
+    handle, path = tempfile.mkstemp(prefix='timereport_', suffix=f'.{export_format}', dir=directory)
+    try:
+        with os.fdopen(handle, 'w', newline='') as fd:
+            count = writers[export_format](records, fd)
+    except Exception:
+        os.remove(path)
+        raise
+    log.debug(f"Exported {count} events for {user_id} to {path}")
+    return path, count
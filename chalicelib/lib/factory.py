@@ -1,17 +1,21 @@
-from datetime import datetime, timedelta
-from ..model.event import create_event
+from datetime import timedelta
+from ..model.event import create_event, Event
+from .dates import resolve
+from .holidays import working_days
 import logging
 
 log = logging.getLogger(__name__)
 
 
-def factory(order):
+def factory(order, working_days_only=False, calendar='se', extra_holidays=()):
     """
     Create correct format from order
     :param order: The order object
+    :param working_days_only: Skip weekends and holidays when expanding a range
+    :param calendar: The holiday calendar to use with working_days_only
+    :param extra_holidays: Extra days off to use with working_days_only
     :return: list
     """
-    format_str = "%Y-%m-%d"
     dates, events = [], []
     user_id, user_name = order['user_id'], order['user_name']
 
@@ -34,19 +38,12 @@ def factory(order):
     except ValueError:
         return False
 
-    if ":" in date_str:
-        date_str_start, date_str_stop = date_str.split(":")
-        date_obj_start = datetime.strptime(date_str_start, format_str)
-        date_obj_stop = datetime.strptime(date_str_stop, format_str)
-        for d in date_range(date_obj_start, date_obj_stop):
-            dates.append(d)
-    elif "today" in date_str:
-        date_obj = datetime.now().date()
-        dates.append(date_obj)
-    else:
-        log.debug(f"Will try to convert string {date_str} to a datetime object")
-        date_obj = datetime.strptime(date_str, format_str)
-        dates.append(date_obj)
+    try:
+        date_start, date_end = resolve(date_str)
+    except ValueError:
+        log.debug(f"Failed to convert string {date_str} to dates")
+        return False
+    dates.extend(expand_range(date_start, date_end, working_days_only, calendar, extra_holidays))
 
     for event_date in dates:
         e = create_event(user_id, user_name, reason, event_date, hours)
@@ -54,12 +51,15 @@ def factory(order):
     return events
 
 
-def json_factory(json_order):
+def json_factory(json_order, working_days_only=False, calendar='se', extra_holidays=()):
     """
     Extract necessary values from the interactive message sent via slack
 
     :param json_order: A dict based on slack interactive message payload
-    :return: list
+    :param working_days_only: Skip weekends and holidays when expanding the range
+    :param calendar: The holiday calendar to use with working_days_only
+    :param extra_holidays: Extra days off to use with working_days_only
+    :return: list of Event
     """
     format_str = "%Y-%m-%d"
 
@@ -73,20 +73,36 @@ def json_factory(json_order):
     stop_date = payload[3]['value']
     hours = payload[4]['value']
     events = []
-    date_obj_start = datetime.strptime(start_date, format_str)
-    date_obj_stop = datetime.strptime(stop_date, format_str)
-    for date in date_range(date_obj_start, date_obj_stop):
+    date_obj_start = resolve(start_date)[0]
+    date_obj_stop = resolve(stop_date)[1]
+    for date in expand_range(date_obj_start, date_obj_stop, working_days_only, calendar, extra_holidays):
         log.info(f'date is {date}')
-        document = {
-            'user_name': user_name,
-            'reason': reason,
-            'event_date': date.strftime(format_str),
-            'hours': hours,
-        }
-        events.append(document)
+        events.append(Event(
+            user_name=user_name,
+            reason=reason,
+            event_date=date.strftime(format_str),
+            hours=hours,
+        ))
     return events
 
 
+def expand_range(start_date, stop_date, working_days_only=False, calendar='se', extra_holidays=()):
+    """
+    The days to create events for.
+    A single day is always kept, even if it isn't a working day.
+
+    :param start_date: The first date
+    :param stop_date: The last date
+    :param working_days_only: Skip weekends and holidays
+    :param calendar: The holiday calendar, see holidays.calendars
+    :param extra_holidays: Extra days off as strings (2019-01-02)
+    :return: iterable of dates
+    """
+    if working_days_only and start_date != stop_date:
+        return working_days(start_date, stop_date, calendar, extra_holidays)
+    return date_range(start_date, stop_date)
+
+
 def date_range(start_date, stop_date):
     delta = timedelta(days=1)
     while start_date <= stop_date:
@@ -98,9 +114,9 @@ def date_to_string(date, format_str='%Y-%m-%d'):
     """
     Converts datetime object to date string.
 
-    :param date: A datetime object
+    :param date: A date or datetime object
     :param format_str: The format (accepted by datetime.strftime)
     :return: The date as a string
     """
-    return datetime.strftime(date, format_str)
+    return date.strftime(format_str)
 
@@ -1,6 +1,8 @@
-from ruamel.yaml import YAML
+import json
+import logging
+import os
 
-yaml=YAML(typ='safe')
+log = logging.getLogger(__name__)
 
 
 def parse_config(path='config.yaml'):
@@ -9,7 +11,58 @@ def parse_config(path='config.yaml'):
     :param path: the path to the config file. config.yaml is default
     :return: config
     """
+    # ruamel is slow to import, so only pay for it when there is no snapshot
+    from ruamel.yaml import YAML
+
+    yaml = YAML(typ='safe')
     with open(path) as fd:
         config = yaml.load(fd)
 
-    return config
\ No newline at end of file
+    return config
+
+
+def snapshot_path(path):
+    """
+    The path of the precompiled json snapshot for a yaml config
+    :param path: the path to the yaml config
+    """
+    return f'{os.path.splitext(path)[0]}.json'
+
+
+def compile_config(path='config.yaml'):
+    """
+    Write the yaml config as a json snapshot next to it.
+    Run at package time so lambda doesn't have to parse yaml on cold start.
+    :param path: the path to the yaml config
+    :return: the path to the snapshot
+    """
+    config = parse_config(path)
+    json_path = snapshot_path(path)
+    with open(json_path, 'w') as fd:
+        json.dump(config, fd, indent=2, sort_keys=True)
+    return json_path
+
+
+def load_config(path='config.yaml'):
+    """
+    Load config, preferring the json snapshot if it is up to date
+    :param path: the path to the yaml config
+    :return: config
+    """
+    json_path = snapshot_path(path)
+    try:
+        snapshot_mtime = os.path.getmtime(json_path)
+    except OSError:
+        return parse_config(path)
+
+    try:
+        stale = os.path.getmtime(path) > snapshot_mtime
+    except OSError:
+        stale = False
+
+    if stale:
+        log.warning(f"Config snapshot {json_path} is older than {path}. Parsing yaml")
+        return parse_config(path)
+
+    with open(json_path) as fd:
+        return json.load(fd)
@@ -0,0 +1,123 @@
+from datetime import date, timedelta
+from functools import lru_cache
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def easter_sunday(year):
+    """
+    The date of easter sunday (anonymous gregorian algorithm)
+
+    :param year: The year
+    :return: datetime.date
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _first_weekday(start, weekday):
+    return start + timedelta(days=(weekday - start.weekday()) % 7)
+
+
+def swedish_holidays(year):
+    """
+    Swedish public holidays, plus the eves that are treated as days off
+    (midsommarafton, julafton and nyårsafton)
+
+    :param year: The year
+    :return: set of datetime.date
+    """
+    easter = easter_sunday(year)
+    midsummer_eve = _first_weekday(date(year, 6, 19), 4)
+    return {
+        date(year, 1, 1),
+        date(year, 1, 6),
+        easter - timedelta(days=2),
+        easter,
+        easter + timedelta(days=1),
+        date(year, 5, 1),
+        easter + timedelta(days=39),
+        easter + timedelta(days=49),
+        date(year, 6, 6),
+        midsummer_eve,
+        midsummer_eve + timedelta(days=1),
+        _first_weekday(date(year, 10, 31), 5),
+        date(year, 12, 24),
+        date(year, 12, 25),
+        date(year, 12, 26),
+        date(year, 12, 31),
+    }
+
+
+calendars = {
+    'se': swedish_holidays,
+    'none': lambda year: set(),
+}
+
+
+@lru_cache(maxsize=64)
+def working_day_table(year, calendar='se', extra_holidays=()):
+    """
+    A table with one entry per day of the year, 1 for working days and 0 for
+    weekends and holidays. Cached per year so long ranges need no per-day lookups.
+
+    :param year: The year
+    :param calendar: The holiday calendar, a key in calendars
+    :param extra_holidays: Tuple of extra days off as strings (2019-01-02)
+    :return: bytes
+    """
+    try:
+        holidays = calendars[calendar](year)
+    except KeyError:
+        raise ValueError(f"Unsupported holiday calendar: {calendar}")
+
+    first = date(year, 1, 1)
+    table = bytearray(
+        1 if (first + timedelta(days=offset)).weekday() < 5 else 0
+        for offset in range((date(year + 1, 1, 1) - first).days)
+    )
+    for holiday in holidays:
+        table[(holiday - first).days] = 0
+    for holiday in extra_holidays:
+        if holiday.startswith(f'{year}-'):
+            table[(date(*map(int, holiday.split('-'))) - first).days] = 0
+    return bytes(table)
+
+
+def working_days(start, end, calendar='se', extra_holidays=()):
+    """
+    The working days between start and end, both included
+
+    :param start: datetime.date
+    :param end: datetime.date
+    :param calendar: The holiday calendar, a key in calendars
+    :param extra_holidays: Iterable of extra days off as dates or strings (2019-01-02)
+    :return: generator of datetime.date
+    """
+    # yaml turns unquoted dates into date objects
+    extra_holidays = tuple(sorted(str(day) for day in extra_holidays))
+    for year in range(start.year, end.year + 1):
+        table = working_day_table(year, calendar, extra_holidays)
+        first = date(year, 1, 1)
+        first_offset = (start - first).days if year == start.year else 0
+        last_offset = (end - first).days if year == end.year else len(table) - 1
+        for offset in range(first_offset, last_offset + 1):
+            if table[offset]:
+                yield first + timedelta(days=offset)
+
+
+def count_working_days(start, end, calendar='se', extra_holidays=()):
+    """
+    Number of working days between start and end, both included
+    """
+    return sum(1 for _ in working_days(start, end, calendar, extra_holidays))
@@ -1,38 +1,79 @@
-import botocore.vendored.requests.api as requests
+from . import client
+from .cache import TTLCache
 import logging
-from datetime import datetime
+from .dates import resolve_strings
+from .timing import timed
 
 log = logging.getLogger(__name__)
 
+# (user_id, startDate, endDate) -> response text from the backend
+list_cache = TTLCache(maxsize=512, ttl=60)
 
-def get_list_data(url, user_id, date_str):
+
+def configure_list_cache(maxsize=512, ttl=60):
+    """
+    Replace the list cache
+
+    :maxsize: Max number of ranges to keep
+    :ttl: Seconds to keep a range
+    """
+    global list_cache
+    list_cache = TTLCache(maxsize=maxsize, ttl=ttl)
+    return list_cache
+
+
+def cache_stats():
+    """
+    Hit and miss counters for the list cache
+    :return: dict
+    """
+    return list_cache.stats()
+
+
+def invalidate(user_id, months):
+    """
+    Drop cached ranges for a user that overlap any of the months
+
+    :user_id: The users user ID
+    :months: List of months as strings (2019-01)
+    """
+    for key in list_cache.keys():
+        cached_user_id, start_date, end_date = key
+        if cached_user_id != user_id:
+            continue
+        if any(start_date[:7] <= month <= end_date[:7] for month in months):
+            list_cache.pop(key)
+
+
+@timed('get_list_data')
+def get_list_data(url, user_id, date_str, cache=True):
     """
     Get existing timereport for a user
 
     :url: The URL to the backend API
     :user_id: The users user ID
-    :date_str: A string contaning date. Valid formats: "2019-01", "2019-01-01", "2019-01-02:2019-01-03"
+    :date_str: A string contaning date. Valid formats: "today", "2019-01", "2019-01-01", "2019-01-02:2019-01-03"
+    :cache: Use and fill the list cache. Bulk reads like exports turn it off so they don't evict other entries
     """
     api_url = f"{url}/event/users/{user_id}"
     try:
-        start_date, end_date = date_str.split(":")
+        start_date, end_date = resolve_strings(date_str)
     except ValueError as error:
-        log.debug(f"Failed to split: {date_str}")
-
-        if len(date_str.split("-")) == 2:
-            start_date = f"{date_str}-01"
-            end_date = f"{date_str}-31"
-        else:
-            start_date, end_date = date_str, date_str
-
-    except Exception as error:
-        log.debug(f"Unexpected exception. Error was: {error}", exc_info=True)
+        log.debug(f"Failed to resolve date string {date_str}: {error}")
         return False
 
     date_str = {"startDate": start_date, "endDate": end_date}
 
-    response = requests.get(url=api_url, params=date_str)
+    cache_key = (user_id, start_date, end_date)
+    cached = list_cache.get(cache_key) if cache else None
+    if cached is not None:
+        log.debug(f"List cache hit for {cache_key}")
+        return cached
+
+    response = client.get(url=api_url, params=date_str)
     if response.status_code == 200:
+        if cache:
+            list_cache.set(cache_key, response.text)
         return response.text
     else:
         log.debug(f"Got response code {response.status_code} for user ID {user_id}")
@@ -1,8 +1,34 @@
-import botocore.vendored.requests.api as requests
+from . import client
+from .cache import TTLCache
+from .list import get_list_data
+from .dates import months_in_range
+from ..model.event import iter_events
+from .timing import timed
 import logging
 
 log = logging.getLogger(__name__)
 
+# (user_id, "2019-08") -> True if the month is locked.
+# Locks are never removed, so locked months are kept longer than unlocked ones.
+lock_index = TTLCache(maxsize=4096, ttl=24 * 60 * 60)
+unlocked_ttl = 5 * 60
+
+
+def configure_lock_index(maxsize=4096, locked_ttl=24 * 60 * 60, unlocked_ttl_seconds=5 * 60):
+    """
+    Replace the lock index
+
+    :param maxsize: Max number of (user, month) pairs to keep
+    :param locked_ttl: Seconds to remember that a month is locked
+    :param unlocked_ttl_seconds: Seconds to remember that a month is not locked
+    """
+    global lock_index, unlocked_ttl
+    lock_index = TTLCache(maxsize=maxsize, ttl=locked_ttl)
+    unlocked_ttl = unlocked_ttl_seconds
+    return lock_index
+
+
+@timed('lock_event')
 def lock_event(url, event):
     """
     Send lock event
@@ -13,5 +39,58 @@ def lock_event(url, event):
     """
     headers={'Content-Type': 'application/json'}
     api_url = f'{url}/lock'
-    response = requests.post(url=api_url, data=event, headers=headers)
-    return response
\ No newline at end of file
+    # Locking an already locked month changes nothing, so the lock is safe to retry
+    response = client.post(url=api_url, data=event, headers=headers, idempotent=True)
+    return response
+
+
+def mark_locked(user_id, month):
+    """
+    Remember that a month is locked for a user
+
+    user_id: The users user ID
+    month: The month as a string (2019-08)
+    """
+    lock_index.set((user_id, month), True)
+
+
+def is_locked(url, user_id, date_start, date_end):
+    """
+    Check if any month in a date range is locked for a user.
+    Months missing in the lock index are fetched from the backend once.
+
+    url: URL to backend API
+    user_id: The users user ID
+    date_start: The first date as a string (2019-01-01)
+    date_end: The last date as a string (2019-01-31)
+    :return: True if any month is locked, False if none is, and None if the
+             lock state of a month could not be fetched
+    """
+    unknown = False
+    for month in months_in_range(date_start, date_end):
+        locked = lock_index.get((user_id, month))
+        if locked is None:
+            locked = _fetch_lock_state(url, user_id, month)
+        if locked:
+            return True
+        if locked is None:
+            unknown = True
+    return None if unknown else False
+
+
+def _fetch_lock_state(url, user_id, month):
+    """
+    :return: If the month is locked, or None if the backend didn't tell. Failures are not cached.
+    """
+    list_data = get_list_data(url, user_id, date_str=month)
+    if list_data is False:
+        log.info(f"Could not get events for {user_id} in {month}. Lock state unknown")
+        return None
+
+    try:
+        locked = any(event.lock for event in iter_events(list_data))
+    except ValueError:
+        log.info(f"Got unexpected list data for {user_id} in {month}. Lock state unknown", exc_info=True)
+        return None
+    lock_index.set((user_id, month), locked, ttl=None if locked else unlocked_ttl)
+    return locked
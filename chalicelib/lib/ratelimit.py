@@ -0,0 +1,224 @@
+import collections
+import contextlib
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Slack web API method -> (calls per minute, burst), for the whole workspace.
+# chat.postMessage is also limited to about one message per second per channel
+# https://api.slack.com/docs/rate-limits
+SLACK_RATE_LIMITS = {
+    'chat.postMessage': (300, 20),
+    'chat.update': (50, 10),
+    'conversations.open': (50, 10),
+    'conversations.members': (100, 10),
+    'files.upload': (20, 5),
+    'users.list': (20, 5),
+}
+
+# Tier 2, for methods without a known limit
+DEFAULT_RATE_LIMIT = (20, 5)
+
+
+class RateLimited(Exception):
+    """
+    A call would have had to wait longer than allowed for its bucket
+    """
+
+    def __init__(self, method, wait):
+        super().__init__(f"Slack method {method} is rate limited for {wait:.2f} seconds")
+        self.method = method
+        self.wait = wait
+
+
+class TokenBucket:
+    """
+    A thread safe token bucket
+
+    Tokens are reserved rather than taken, so callers that arrive while the
+    bucket is empty are queued behind each other instead of failing.
+    """
+
+    def __init__(self, per_minute, burst=1, clock=time.monotonic):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.clock = clock
+        self._tokens = burst
+        self._updated = clock()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """
+        Reserve a token
+
+        :return: Seconds to wait before the token may be used
+        """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+            return max(wait, self._paused_until - now)
+
+    def refund(self):
+        """
+        Give back a reserved token that was never used
+        """
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def pause(self, seconds):
+        """
+        Hold back every call for seconds, like slack asks for with Retry-After
+        """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0)
+            self._paused_until = max(self._paused_until, now + seconds)
+
+
+def retry_after(result):
+    """
+    The Retry-After of a rate limited slack response
+
+    :param result: A response, or a SlackApiError carrying one
+    :return: Seconds to wait, or None if the response was not rate limited
+    """
+    response = getattr(result, 'response', None) if isinstance(result, Exception) else result
+    if getattr(response, 'status_code', None) != 429:
+        return None
+    try:
+        return float(response.headers.get('Retry-After', 1))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
+
+
+class RateLimiter:
+    """
+    Per method token buckets for slack web API calls
+
+    Calls wait for their bucket instead of failing, unless that takes more
+    than max_wait seconds. A 429 from slack pauses the bucket for Retry-After
+    seconds and the call is retried once the pause is over.
+
+    Requests slack waits on keep max_wait short. Deferred work, which slack
+    doesn't wait on, runs in deferred() and waits up to deferred_max_wait.
+    """
+
+    def __init__(self, limits=None, default=DEFAULT_RATE_LIMIT, max_wait=1, deferred_max_wait=60,
+                 max_retries=3, clock=time.monotonic, sleep=time.sleep):
+        self.limits = dict(SLACK_RATE_LIMITS, **(limits or {}))
+        self.default = default
+        self.max_wait = max_wait
+        self.deferred_max_wait = deferred_max_wait
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sleep = sleep
+        self.counters = collections.defaultdict(collections.Counter)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def bucket(self, method):
+        with self._lock:
+            if method not in self._buckets:
+                per_minute, burst = self.limits.get(method, self.default)
+                self._buckets[method] = TokenBucket(per_minute, burst, clock=self.clock)
+            return self._buckets[method]
+
+    @contextlib.contextmanager
+    def deferred(self):
+        """
+        Let calls made by this thread wait up to deferred_max_wait seconds
+        """
+        previous = getattr(self._local, 'max_wait', None)
+        self._local.max_wait = self.deferred_max_wait
+        try:
+            yield self
+        finally:
+            self._local.max_wait = previous
+
+    def current_max_wait(self):
+        """
+        :return: Max seconds a call made by this thread may wait
+        """
+        max_wait = getattr(self._local, 'max_wait', None)
+        return self.max_wait if max_wait is None else max_wait
+
+    def _count(self, method, key, value=1):
+        with self._lock:
+            self.counters[method][key] += value
+
+    def acquire(self, method, max_wait=None):
+        """
+        Wait until a call to method is allowed
+
+        :param max_wait: Max seconds to wait. Defaults to current_max_wait
+        :return: Seconds waited
+        :raises RateLimited: If the call would have to wait more than max_wait seconds.
+                             The reserved token is given back
+        """
+        if max_wait is None:
+            max_wait = self.current_max_wait()
+        bucket = self.bucket(method)
+        wait = bucket.reserve()
+        if wait > max_wait:
+            bucket.refund()
+            self._count(method, 'rejected')
+            raise RateLimited(method, wait)
+        if wait > 0:
+            log.debug(f"Throttling {method} for {wait:.2f} seconds")
+            self._count(method, 'throttled')
+            self._count(method, 'waited', wait)
+            self.sleep(wait)
+        return max(wait, 0)
+
+    def call(self, method, func, *args, **kwargs):
+        """
+        Call func once method is allowed, retrying when slack answers 429
+
+        current_max_wait bounds the time waited over all attempts, so a call
+        made while slack waits on the request can't outlast it.
+
+        :param method: The slack web API method, e.g. chat.update
+        :param func: Function doing the call. Returns a response or raises SlackApiError
+        :return: What func returns
+        :raises RateLimited: If the call would wait more than current_max_wait seconds in total,
+                             or slack still answers 429 after max_retries retries
+        """
+        max_wait = self.current_max_wait()
+        waited = 0
+        for attempt in range(self.max_retries + 1):
+            waited += self.acquire(method, max_wait - waited)
+            self._count(method, 'calls')
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                seconds = retry_after(error)
+                if seconds is None:
+                    raise
+            else:
+                seconds = retry_after(result)
+                if seconds is None:
+                    return result
+
+            self._count(method, 'rate_limited')
+            self.bucket(method).pause(seconds)
+            if attempt == self.max_retries:
+                raise RateLimited(method, seconds)
+            log.info(f"Slack rate limited {method}. Retrying in {seconds} seconds")
+
+    def stats(self):
+        """
+        :return: dict of method -> calls, throttled, rejected, rate_limited and seconds waited
+        """
+        with self._lock:
+            return {method: dict(counter) for method, counter in self.counters.items()}
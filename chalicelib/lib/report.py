@@ -0,0 +1,193 @@
+from collections import Counter
+from datetime import datetime
+import logging
+
+log = logging.getLogger(__name__)
+
+# Slack cuts long messages, and long messages are slow to post
+MAX_MESSAGE_LENGTH = 3000
+
+def summarize(records):
+    """
+    Sum up hours per reason, week and month in one pass.
+    Events without a valid date are skipped and counted.
+
+    :param records: Iterable of Event
+    :return: dict
+    """
+    reasons, weeks, months = Counter(), Counter(), Counter()
+    locked, days = set(), set()
+    total = 0.0
+    skipped = 0
+    first = last = None
+
+    for record in records:
+        try:
+            date = datetime.strptime(record.event_date, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            log.debug(f"Skipping event with invalid date: {record}")
+            skipped += 1
+            continue
+        year, week, _ = date.isocalendar()
+        month = record.event_date[:7]
+
+        reasons[record.reason] += record.hours
+        weeks[f'{year}-W{week:02d}'] += record.hours
+        months[month] += record.hours
+        days.add(record.event_date)
+        total += record.hours
+        if record.lock:
+            locked.add(month)
+        first = record.event_date if first is None else min(first, record.event_date)
+        last = record.event_date if last is None else max(last, record.event_date)
+
+    return {
+        'first': first,
+        'last': last,
+        'days': len(days),
+        'hours': total,
+        'reasons': reasons,
+        'weeks': weeks,
+        'months': months,
+        'locked': sorted(locked),
+        'skipped': skipped,
+    }
+
+
+def truncate(lines, max_length=MAX_MESSAGE_LENGTH):
+    """
+    Join lines, dropping the ones that don't fit in max_length
+
+    :param lines: List of strings
+    :param max_length: Max length of the result
+    :return: string
+    """
+    result, length = [], 0
+    for number, line in enumerate(lines):
+        if length + len(line) + 1 > max_length - 40:
+            result.append(f'... and {len(lines) - number} more lines')
+            break
+        result.append(line)
+        length += len(line) + 1
+    return '\n'.join(result)
+
+
+def render_summary(summary, max_length=MAX_MESSAGE_LENGTH):
+    """
+    Render a summary as a slack message
+
+    :param summary: dict from summarize
+    :param max_length: Max length of the message
+    :return: string
+    """
+    lines = [
+        f"*{summary['first']} - {summary['last']}*: "
+        f"{summary['days']} days, {summary['hours']:g} hours",
+        '*Per reason*',
+    ]
+    lines += [f'{reason}: {hours:g} h' for reason, hours in sorted(summary['reasons'].items())]
+    if len(summary['months']) > 1:
+        lines.append('*Per month*')
+        lines += [f'{month}: {hours:g} h' for month, hours in sorted(summary['months'].items())]
+    lines.append('*Per week*')
+    lines += [f'{week}: {hours:g} h' for week, hours in sorted(summary['weeks'].items())]
+    if summary['locked']:
+        lines.append(f":lock: Locked: {', '.join(summary['locked'])}")
+    if summary.get('skipped'):
+        lines.append(f":warning: Skipped {summary['skipped']} events without a valid date")
+    return truncate(lines, max_length)
+
+
+def render_detail(records, max_length=MAX_MESSAGE_LENGTH):
+    """
+    Render one line per event as a slack message
+
+    :param records: Iterable of Event
+    :param max_length: Max length of the message
+    :return: string
+    """
+    lines = [
+        f"{record.event_date} {record.reason} {record.hours:g} h{' :lock:' if record.lock else ''}"
+        for record in sorted(records, key=lambda record: record.event_date)
+    ]
+    return truncate(lines, max_length)
+
+
+def summarize_team(user_records, expected_days):
+    """
+    Sum up hours per user and reason, and find the working days users haven't reported
+
+    :param user_records: Iterable of (user ID, iterable of Event), or (user ID, None) if
+                         the events of the user could not be fetched
+    :param expected_days: Iterable of the working days as strings (2019-01-02)
+    :return: dict
+    """
+    expected_days = set(expected_days)
+    users, failed = [], []
+    reasons = Counter()
+
+    for user_id, records in user_records:
+        if records is None:
+            failed.append(user_id)
+            continue
+
+        name = user_id
+        user_reasons = Counter()
+        days = set()
+        for record in records:
+            user_reasons[record.reason] += record.hours
+            days.add(record.event_date)
+            name = record.user_name or name
+        reasons.update(user_reasons)
+        users.append({
+            'user_id': user_id,
+            'name': name,
+            'hours': sum(user_reasons.values()),
+            'reasons': user_reasons,
+            'missing': sorted(expected_days - days),
+        })
+
+    return {
+        'users': sorted(users, key=lambda user: user['name'].lower()),
+        'failed': failed,
+        'reasons': reasons,
+        'hours': sum(reasons.values()),
+        'working_days': len(expected_days),
+    }
+
+
+def render_team(summary, title, max_length=MAX_MESSAGE_LENGTH):
+    """
+    Render a team summary as one table
+
+    :param summary: dict from summarize_team
+    :param title: Shown above the table, e.g. the month
+    :param max_length: Max length of the message
+    :return: string
+    """
+    reasons = sorted(summary['reasons'])
+    missing = [user for user in summary['users'] if user['missing']]
+    header = (
+        f"*{title}*: {len(summary['users'])} users, {summary['hours']:g} hours, "
+        f"{summary['working_days']} working days"
+    )
+
+    name_width = max([len(user['name']) for user in summary['users']] + [4])
+    columns = reasons + ['total', 'missing']
+    widths = [max(len(column), 5) for column in columns]
+    rows = [f"{'user':<{name_width}} " + ' '.join(f'{column:>{width}}' for column, width in zip(columns, widths))]
+    for user in summary['users']:
+        values = [f"{user['reasons'][reason]:g}" for reason in reasons]
+        values += [f"{user['hours']:g}", str(len(user['missing']))]
+        rows.append(f"{user['name']:<{name_width}} " + ' '.join(f'{value:>{width}}' for value, width in zip(values, widths)))
+
+    footer = []
+    if missing:
+        footer.append(f":warning: {len(missing)} users have missing working days")
+    if summary['failed']:
+        failed = ', '.join(summary['failed'][:10]) + (', ...' if len(summary['failed']) > 10 else '')
+        footer.append(f":x: Could not fetch {len(summary['failed'])} users: {failed}")
+
+    # The table is closed after truncating, so a cut table still renders as one block
+    table = truncate(rows, max_length - len(header) - sum(len(line) + 1 for line in footer) - 10)
+    return '\n'.join([header, f"```{table}```"] + footer)
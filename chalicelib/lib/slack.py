@@ -1,65 +1,297 @@
 import os
-import botocore.vendored.requests.api as requests
+from . import client
 from urllib.parse import parse_qs
 import logging
 import json
 import hmac
 import hashlib
 import base64
-import slack
+import threading
+import time
+from .cache import TTLCache, FileCache
+from .ratelimit import RateLimiter, RateLimited
+from .timing import timed
 
 log = logging.getLogger(__name__)
 
+SLACK_API_URL = 'https://slack.com/api/'
+
+# user_id -> direct message channel ID. Shared by all Slack objects in the process
+dm_channel_cache = TTLCache(maxsize=1024, ttl=24 * 60 * 60)
+
+# team ID -> frozenset of the IDs of bots and deactivated users, from users.list
+non_person_cache = TTLCache(maxsize=64, ttl=60 * 60)
+
+# Results of verify_request
+REQUEST_VALID = 'valid'
+REQUEST_INVALID = 'invalid'
+REQUEST_STALE = 'stale'
+REQUEST_DUPLICATE = 'duplicate'
+
+# Slack recommends rejecting requests older than five minutes
+MAX_REQUEST_AGE = 5 * 60
+
+# Signatures of recently verified requests, used to drop replays and retries
+seen_signatures = TTLCache(maxsize=10000, ttl=MAX_REQUEST_AGE)
+
+
+def configure_dm_channel_cache(maxsize=1024, ttl=24 * 60 * 60, path=None):
+    """
+    Replace the direct message channel cache
+
+    :param maxsize: Max number of users to keep channel IDs for
+    :param ttl: Seconds to keep a channel ID
+    :param path: Optional file to persist the cache in
+    """
+    global dm_channel_cache
+    if path:
+        dm_channel_cache = FileCache(path, maxsize=maxsize, ttl=ttl)
+    else:
+        dm_channel_cache = TTLCache(maxsize=maxsize, ttl=ttl)
+    return dm_channel_cache
+
+
+# Client side limits for slack web API calls, shared by the process
+rate_limiter = RateLimiter()
+
+
+def configure_rate_limiter(limits=None, max_wait=1, deferred_max_wait=60, max_retries=3):
+    """
+    Replace the slack rate limiter
+
+    :param limits: dict of slack method -> (calls per minute, burst), merged with SLACK_RATE_LIMITS
+    :param max_wait: Max seconds a call waits for its method's bucket. Calls that would wait
+                     longer raise RateLimited. Keep it well below the 3 seconds slack gives a command
+    :param deferred_max_wait: Max seconds a call waits inside deferred_rate_limits, e.g. for Retry-After
+    :param max_retries: Max retries of a call slack answered with 429
+    """
+    global rate_limiter
+    rate_limiter = RateLimiter(
+        limits={method: tuple(limit) for method, limit in (limits or {}).items()},
+        max_wait=max_wait,
+        deferred_max_wait=deferred_max_wait,
+        max_retries=max_retries,
+    )
+    return rate_limiter
+
+
+def deferred_rate_limits():
+    """
+    Context manager letting slack calls of the current thread wait up to
+    deferred_max_wait seconds. For work slack isn't waiting on.
+    """
+    return rate_limiter.deferred()
+
+
+def rate_limit_stats():
+    """
+    Counters of calls, throttled calls and 429s per slack method
+    """
+    return rate_limiter.stats()
+
+
+class SlackApi:
+    """
+    A stateless slack web API client. One is shared by every request using
+    the same token, so it is safe to use from several threads at once.
+    """
+
+    def __init__(self, slack_token, base_url=SLACK_API_URL, team_id=None):
+        # slackclient pulls in aiohttp, which is slow to import on cold start
+        import slack
+
+        self.slack_token = slack_token
+        self.team_id = team_id
+        self.client = slack.WebClient(token=slack_token, base_url=base_url)
+
+    def open_conversation(self, slack_user_id):
+        """
+        Open a direct message channel with user.
+        Uses the cached channel ID if there is one.
+        :slack_user_id: The slack user ID to open channel for
+        :return: The channel ID and if the channel already was open
+        """
+        cache_key = f'{self.team_id}/{slack_user_id}' if self.team_id else slack_user_id
+        channel = dm_channel_cache.get(cache_key)
+        if channel:
+            log.debug(f"Found cached direct message channel for {slack_user_id}")
+            return channel, True
+
+        response = rate_limiter.call('conversations.open', self.client.conversations_open, users=[slack_user_id])
+        channel = response['channel']['id']
+        dm_channel_cache.set(cache_key, channel)
+        return channel, response.get('already_open')
+
+    def send_message(self, channel, message):
+        return rate_limiter.call('chat.postMessage', self.client.chat_postMessage, channel=channel, text=message)
+
+    def update_message(self, channel, ts, message):
+        return rate_limiter.call('chat.update', self.client.chat_update, channel=channel, text=message, ts=ts)
+
+    def channel_members(self, channel):
+        """
+        The user IDs of the members of a channel
+        :channel: The channel ID
+        :return: list of user IDs
+        """
+        members, cursor = [], None
+        while True:
+            kwargs = {'cursor': cursor} if cursor else {}
+            response = rate_limiter.call(
+                'conversations.members', self.client.conversations_members, channel=channel, limit=200, **kwargs
+            )
+            members += response['members']
+            cursor = (response.get('response_metadata') or {}).get('next_cursor')
+            if not cursor:
+                return members
+
+    def non_person_ids(self, deadline=None, clock=time.monotonic):
+        """
+        The IDs of the bots and deactivated users of the workspace.
+        Read from users.list a page at a time and cached, since they rarely change.
+
+        :deadline: clock() value after which no more pages are fetched. A partial result is not cached
+        :return: frozenset of user IDs
+        """
+        cache_key = self.team_id or ''
+        cached = non_person_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        user_ids, cursor = set(), None
+        while True:
+            kwargs = {'cursor': cursor} if cursor else {}
+            response = rate_limiter.call('users.list', self.client.users_list, limit=200, **kwargs)
+            user_ids.update(
+                user['id'] for user in response['members'] if user.get('is_bot') or user.get('deleted')
+            )
+            cursor = (response.get('response_metadata') or {}).get('next_cursor')
+            if not cursor:
+                break
+            if deadline is not None and clock() >= deadline:
+                log.info(f"Stopped reading users.list at the deadline. Found {len(user_ids)} bots so far")
+                return frozenset(user_ids)
+
+        non_person_cache.set(cache_key, frozenset(user_ids))
+        return frozenset(user_ids)
+
+    def upload_file(self, channel, path, filename, title=None, comment=None):
+        kwargs = {'initial_comment': comment} if comment else {}
+        return rate_limiter.call(
+            'files.upload',
+            self.client.files_upload,
+            channels=channel,
+            file=path,
+            filename=filename,
+            title=title or filename,
+            **kwargs
+        )
+
+
+_apis = {}
+_apis_lock = threading.Lock()
+
+
+def get_api(slack_token, base_url=SLACK_API_URL, team_id=None):
+    """
+    Get the shared SlackApi for a token and workspace, creating it on first use.
+    Lives at module scope so warm lambda invocations reuse the WebClient.
+    """
+    key = (slack_token, team_id, base_url)
+    with _apis_lock:
+        if key not in _apis:
+            log.debug(f"Creating slack API client for workspace {team_id}")
+            _apis[key] = SlackApi(slack_token, base_url=base_url, team_id=team_id)
+        return _apis[key]
+
+
+def payload_team_id(payload):
+    """
+    The workspace ID of a slash command or interactive message payload
+    """
+    if 'team' in payload:
+        return (payload.get('team') or {}).get('id')
+    return (payload.get('team_id') or [None])[0]
+
+
+def bot_token(config, team_id=None):
+    """
+    The bot token for a workspace.
+    Workspaces in bot_access_tokens get their own token, all others use bot_access_token.
+
+    :param config: The app config
+    :param team_id: The workspace ID
+    """
+    return (config.get('bot_access_tokens') or {}).get(team_id) or config['bot_access_token']
+
 
 class Slack:
+    """
+    A conversation with one user, for the duration of one request.
+    Cheap to create, the API client behind it is shared.
+
+    :slack_token: The bot token
+    :base_url: The slack web API URL
+    :channel: Channel of the conversation, if it is already known
+    :ts: Timestamp of the message to update, if it is already known
+    :team_id: The workspace of the conversation
+    """
 
-    def __init__(self, slack_token):
+    def __init__(self, slack_token, base_url=SLACK_API_URL, channel=None, ts=None, team_id=None):
+        self.api = get_api(slack_token, base_url, team_id)
         self.slack_token = slack_token
-        self.client = slack.WebClient(token=slack_token)
-        self.slack_dm_channel = None
-        self.slack_timestamp = None
-        self.is_conversation_open = False
+        self.client = self.api.client
+        self.slack_dm_channel = channel
+        self.slack_timestamp = ts
+        self.is_conversation_open = channel is not None
 
 
+    @timed('open_conversation')
     def open_conversation(self, slack_user_id):
         """
-        Open a direct message channel with user
+        Open a direct message channel with user.
+        Uses the cached channel ID if there is one.
         :slack_user_id: The slack user ID to open channel for
         """
 
-        response = self.client.conversations_open(users=[slack_user_id])
-        self.slack_dm_channel = response['channel']['id']
-        self.is_conversation_open = response.get('already_open')
-        return response
+        self.slack_dm_channel, self.is_conversation_open = self.api.open_conversation(slack_user_id)
+        return {'ok': True, 'channel': {'id': self.slack_dm_channel}, 'already_open': self.is_conversation_open}
 
     
+    @timed('send_message')
     def send_message(self, message):
         """
         Send a slack message
         :message: The message to send
         """
 
-        response = self.client.chat_postMessage(
-            channel=self.slack_dm_channel,
-            text=message,
-        )
+        response = self.api.send_message(self.slack_dm_channel, message)
         self.slack_timestamp = response['ts']
         return response
     
 
+    @timed('update_message')
     def update_message(self, message):
         """
         Update a slack message
         :message: The message to send
         """
-        response = self.client.chat_update(
-            channel=self.slack_dm_channel,
-            text=message,
-            ts=self.slack_timestamp,
-        )
-        return response
+        return self.api.update_message(self.slack_dm_channel, self.slack_timestamp, message)
+
+
+    @timed('upload_file')
+    def upload_file(self, path, filename, title=None, comment=None):
+        """
+        Upload a file to the conversation
+        :path: Path of the file to upload
+        :filename: The file name shown in slack
+        :title: Optional title. Defaults to the file name
+        :comment: Optional message posted with the file
+        """
+        return self.api.upload_file(self.slack_dm_channel, path, filename, title=title, comment=comment)
         
 
+@timed('slack_client_responder')
 def slack_client_responder(token, user_id, attachment, url='https://slack.com/api/chat.postMessage'):
     """
     Sends an direct message to a user.
@@ -74,22 +306,32 @@ def slack_client_responder(token, user_id, attachment, url='https://slack.com/ap
 
     log.debug(f"Will try to post direct message to user {user_id}")
     headers = {'Content-Type': 'application/json; charset=utf-8', 'Authorization': f'Bearer {token}'}
-    return requests.post(
+    return rate_limiter.call(
+        url.rsplit('/', 1)[-1],
+        client.post,
         url=url,
         json={'channel': user_id, 'text': 'From timereport', 'attachments': attachment},
         headers=headers
     )
 
 
-def slack_responder(url, msg):
+@timed('slack_responder')
+def slack_responder(url, msg, attachments=None, replace_original=False):
     """
     Sends post to slack_response_url
     :param url: slack response_url
     :param msg:
+    :param attachments: Optional slack attachments to send with the message
+    :param replace_original: Replace the message of an interactive response_url instead of adding one
     :return: boolean
     """
     headers = {'Content-Type': 'application/json'}
-    res = requests.post(url=url, json={"text": msg}, headers=headers)
+    data = {"text": msg}
+    if attachments:
+        data["attachments"] = attachments
+    if replace_original:
+        data["replace_original"] = True
+    res = client.post(url=url, json=data, headers=headers)
     return res.status_code
 
 
@@ -218,6 +460,52 @@ def verify_token(headers, body, signing_secret):
         return False
 
 
+def verify_request(headers, body, signing_secret, max_age=MAX_REQUEST_AGE, now=None):
+    """
+    Verify a request from slack before anything in it is parsed.
+
+    Checks are ordered cheapest first:
+    1. Missing headers and timestamps older than max_age are rejected
+    2. Slack retries and signatures seen within max_age are duplicates
+    3. The signature is verified like in verify_token, and then remembered
+
+    :param headers: The request headers
+    :param body: The raw request body, bytes or str
+    :param signing_secret: The signing secret from slack settings
+    :param max_age: Max age of the request timestamp in seconds
+    :param now: The current unix time. Defaults to time.time()
+    :return: One of REQUEST_VALID, REQUEST_INVALID, REQUEST_STALE or REQUEST_DUPLICATE
+    """
+    request_timestamp = headers.get('X-Slack-Request-Timestamp')
+    slack_signature = headers.get('X-Slack-Signature')
+    if not request_timestamp or not slack_signature:
+        log.info("Request is missing slack signature headers")
+        return REQUEST_INVALID
+
+    try:
+        age = (time.time() if now is None else now) - int(request_timestamp)
+    except ValueError:
+        log.info(f"Invalid request timestamp: {request_timestamp}")
+        return REQUEST_INVALID
+    if abs(age) > max_age:
+        log.info(f"Request timestamp is {age:.0f} seconds old")
+        return REQUEST_STALE
+
+    if headers.get('X-Slack-Retry-Num') or slack_signature in seen_signatures:
+        log.info("Dropping duplicate request from slack")
+        return REQUEST_DUPLICATE
+
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    request_basestring = b'v0:' + request_timestamp.encode('utf-8') + b':' + body
+    my_sig = f'v0={hmac.new(bytes(signing_secret, "utf-8"), request_basestring, hashlib.sha256).hexdigest()}'
+    if not hmac.compare_digest(my_sig, slack_signature):
+        return REQUEST_INVALID
+
+    seen_signatures.set(slack_signature, True, ttl=max_age)
+    return REQUEST_VALID
+
+
 def submit_message_menu(user_name, reason, date_start, date_end, hours):
     attachment = [
         {
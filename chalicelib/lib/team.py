@@ -0,0 +1,46 @@
+import logging
+import time
+from .dispatch import fan_out
+from .list import get_list_data
+from ..model.event import iter_events
+
+log = logging.getLogger(__name__)
+
+
+def fetch_team(url, user_ids, date_str, max_workers=16, budget=None, started=None, clock=time.monotonic):
+    """
+    Fetch the events of many users, max_workers users at a time
+
+    No new users are fetched once budget seconds have passed, so the caller
+    can answer before lambda times out.
+
+    :param url: The URL to the backend API
+    :param user_ids: The users user IDs
+    :param date_str: The range. Valid formats are the ones of dates.resolve
+    :param max_workers: Max number of users fetched at once
+    :param budget: Max seconds to spend starting fetches, or None for no limit
+    :param started: clock() value the budget counts from, e.g. from before looking up the users.
+                    Defaults to now
+    :return: tuple of a list of (user ID, list of Event or None if the fetch failed)
+             and a list of the user IDs skipped because the budget ran out
+    """
+    def fetch(user_id):
+        # One report reads every member, so keep it out of the cache of single users
+        list_data = get_list_data(url, user_id, date_str, cache=False)
+        if list_data is False:
+            raise ValueError(f"Failed to fetch events of {user_id}")
+        return list(iter_events(list_data))
+
+    user_ids = list(user_ids)
+    if started is None:
+        started = clock()
+    deadline = None if budget is None else started + budget
+    results = []
+    for start in range(0, len(user_ids), max_workers):
+        if deadline is not None and clock() >= deadline:
+            skipped = user_ids[start:]
+            log.info(f"Team report budget of {budget} seconds spent. Skipping {len(skipped)} users")
+            return results, skipped
+        window = user_ids[start:start + max_workers]
+        results += [(result.item, result.value) for result in fan_out(fetch, window, max_workers)]
+    return results, []
@@ -0,0 +1,162 @@
+import contextlib
+import functools
+import json
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Checked before anything else, so disabled timing costs one global lookup per call
+enabled = False
+namespace = 'timereport'
+
+_local = threading.local()
+
+
+def configure(enable=False, metric_namespace='timereport'):
+    """
+    Turn timing on or off
+
+    :param enable: Record spans and emit one timing line per request
+    :param metric_namespace: The CloudWatch metric namespace
+    """
+    global enabled, namespace
+    enabled = bool(enable)
+    namespace = metric_namespace
+
+
+class Recorder:
+    """
+    The spans recorded during one request
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans = []
+
+    def add(self, name, duration_ms, status):
+        # list.append is atomic, so fan_out worker threads can share a recorder
+        self.spans.append((name, duration_ms, status))
+
+    def to_emf(self, **properties):
+        """
+        The recorded spans as a CloudWatch embedded metric format document.
+        Spans with the same name are summed.
+        """
+        totals, counts = {}, {}
+        for name, duration_ms, _ in self.spans:
+            totals[name] = totals.get(name, 0.0) + duration_ms
+            counts[name] = counts.get(name, 0) + 1
+
+        document = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': namespace,
+                    'Dimensions': [['request']],
+                    'Metrics': [{'Name': 'total', 'Unit': 'Milliseconds'}] + [
+                        {'Name': name, 'Unit': 'Milliseconds'} for name in totals
+                    ],
+                }],
+            },
+            'request': self.name,
+            'total': round((time.perf_counter() - self.start) * 1000, 2),
+            'calls': counts,
+            'spans': [
+                {'name': name, 'ms': round(duration_ms, 2), 'status': status}
+                for name, duration_ms, status in self.spans
+            ],
+        }
+        for name, total in totals.items():
+            document[name] = round(total, 2)
+        document.update(properties)
+        return document
+
+
+def current():
+    """
+    The recorder of the request running in this thread, or None
+    """
+    return getattr(_local, 'recorder', None)
+
+
+def activate(recorder):
+    """
+    Record spans from this thread in recorder. Used to hand a request over to worker threads.
+    """
+    _local.recorder = recorder
+
+
+@contextlib.contextmanager
+def request(name, **properties):
+    """
+    Time a request and print its timing breakdown as one json line when done
+
+    :param name: The request name, used as metric dimension
+    :param properties: Extra properties to add to the line
+    """
+    if not enabled:
+        yield None
+        return
+
+    recorder = Recorder(name)
+    previous = current()
+    activate(recorder)
+    try:
+        yield recorder
+    finally:
+        activate(previous)
+        print(json.dumps(recorder.to_emf(**properties)), flush=True)
+
+
+@contextlib.contextmanager
+def span(name):
+    """
+    Time a block. Set .status on the yielded dict to record a status, the default is ok.
+    """
+    recorder = current() if enabled else None
+    if recorder is None:
+        yield {}
+        return
+
+    result = {'status': 'ok'}
+    start = time.perf_counter()
+    try:
+        yield result
+    except Exception:
+        result['status'] = 'error'
+        raise
+    finally:
+        recorder.add(name, (time.perf_counter() - start) * 1000, result['status'])
+
+
+def _status(result):
+    status_code = getattr(result, 'status_code', None)
+    if status_code is not None:
+        return status_code
+    return 'failed' if result is False else 'ok'
+
+
+def timed(name):
+    """
+    Decorator recording a span for every call. Responses record their status code.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = current() if enabled else None
+            if recorder is None:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                result = func(*args, **kwargs)
+                status = _status(result)
+                return result
+            finally:
+                recorder.add(name, (time.perf_counter() - start) * 1000, status)
+        return wrapper
+    return decorator
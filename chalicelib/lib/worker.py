@@ -0,0 +1,186 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class ThreadQueue:
+    """
+    Run jobs on a background thread in this process
+
+    Note that lambda freezes the process once the response is returned,
+    so a job can be finished in the next invocation of the same container.
+    Use SQLiteQueue if jobs must survive the container being recycled.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, job):
+        """
+        Add a job to the queue
+
+        :job: A json serializable job, handed to the handler as is
+        """
+        self._ensure_thread()
+        self._queue.put(job)
+
+    def join(self):
+        """
+        Wait until every queued job is handled
+        """
+        self._queue.join()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='timereport-worker', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self.handler(job)
+            except Exception as error:
+                log.error(f"Job failed: {error}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+
+class SQLiteQueue:
+    """
+    Store jobs in a sqlite database and run them on a background thread
+
+    Jobs left in the database by an earlier process are run when the queue is created.
+    Failed jobs are retried after retry_backoff seconds, doubled for every attempt,
+    so a short backend outage doesn't use up every attempt.
+    """
+
+    def __init__(self, handler, path='/tmp/timereport_jobs.sqlite', max_attempts=3, poll_interval=1.0,
+                 retry_backoff=5.0, clock=time.time):
+        self.handler = handler
+        self.path = path
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.clock = clock
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._lock = threading.Lock()
+
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'job TEXT NOT NULL, '
+                'attempts INTEGER NOT NULL DEFAULT 0, '
+                'not_before REAL NOT NULL DEFAULT 0)'
+            )
+            # Databases created before retries were delayed
+            columns = [row[1] for row in db.execute('PRAGMA table_info(jobs)')]
+            if 'not_before' not in columns:
+                db.execute('ALTER TABLE jobs ADD COLUMN not_before REAL NOT NULL DEFAULT 0')
+
+        self._thread = threading.Thread(target=self._run, name='timereport-sqlite-worker', daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def put(self, job):
+        """
+        Add a job to the queue
+
+        :job: A json serializable job, handed to the handler as is
+        """
+        with self._lock, self._connect() as db:
+            db.execute('INSERT INTO jobs (job) VALUES (?)', (json.dumps(job),))
+            self._idle.clear()
+        self._wakeup.set()
+
+    def join(self, timeout=None):
+        """
+        Wait until every queued job is handled
+
+        :return: True if the queue is empty
+        """
+        self._wakeup.set()
+        return self._idle.wait(timeout)
+
+    def _next_job(self):
+        """
+        :return: The next due job as (id, job, attempts), or the seconds until
+                 the next job is due, or None if the queue is empty
+        """
+        now = self.clock()
+        with self._lock, self._connect() as db:
+            row = db.execute(
+                'SELECT id, job, attempts FROM jobs WHERE not_before <= ? ORDER BY id LIMIT 1', (now,)
+            ).fetchone()
+            if row:
+                db.execute('UPDATE jobs SET attempts = attempts + 1 WHERE id = ?', (row[0],))
+                return row
+
+            not_before = db.execute('SELECT MIN(not_before) FROM jobs').fetchone()[0]
+            if not_before is None:
+                self._idle.set()
+                return None
+            return not_before - now
+
+    def _retry_later(self, job_id, attempts):
+        delay = self.retry_backoff * 2 ** (attempts - 1)
+        log.info(f"Retrying job {job_id} in {delay:g} seconds")
+        with self._lock, self._connect() as db:
+            db.execute('UPDATE jobs SET not_before = ? WHERE id = ?', (self.clock() + delay, job_id))
+
+    def _remove_job(self, job_id):
+        with self._lock, self._connect() as db:
+            db.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def _run(self):
+        while True:
+            row = self._next_job()
+            if not isinstance(row, tuple):
+                self._wakeup.wait(self.poll_interval if row is None else min(row, self.poll_interval))
+                self._wakeup.clear()
+                continue
+
+            job_id, job, attempts = row
+            try:
+                self.handler(json.loads(job))
+            except Exception as error:
+                log.error(f"Job {job_id} failed on attempt {attempts + 1}: {error}", exc_info=True)
+                if attempts + 1 < self.max_attempts:
+                    self._retry_later(job_id, attempts + 1)
+                    continue
+                log.error(f"Giving up on job {job_id}")
+            self._remove_job(job_id)
+
+
+queue_types = {
+    'thread': ThreadQueue,
+    'sqlite': SQLiteQueue,
+}
+
+
+def create_queue(queue_type, handler, **kwargs):
+    """
+    Create a deferred worker queue
+
+    :queue_type: One of the keys in queue_types
+    :handler: Called with every job put on the queue
+    :kwargs: Passed on to the queue class
+    """
+    try:
+        queue_class = queue_types[queue_type]
+    except KeyError:
+        raise ValueError(f"Unsupported worker queue: {queue_type}")
+    return queue_class(handler, **kwargs)
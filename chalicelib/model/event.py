@@ -1,23 +1,23 @@
 import json
-from datetime import datetime
 import logging
+from ..lib.dates import resolve
 log = logging.getLogger(__name__)
 
 def create_event(user_id, user_name, reason, event_date, hours):
     format_str = "%Y-%m-%d"
-    event = {
-        'user_id': user_id,
-        'user_name': user_name,
-        'reason': reason,
-        'event_date': event_date.strftime(format_str),
-        'hours': hours,
-    }
-    return event
+    return Event(
+        user_id=user_id,
+        user_name=user_name,
+        reason=reason,
+        event_date=event_date.strftime(format_str),
+        hours=hours,
+    )
 
 def create_lock(user_id, event_date):
-    format_str = "%Y-%m"
     try:
-        datetime.strptime(event_date, format_str)
+        if len(event_date.split("-")) != 2:
+            raise ValueError(f"{event_date} is not a month")
+        resolve(event_date)
     except ValueError:
         log.error(f"The event_date {event_date} isn't a valid format")
         return False # Returnera tillbaka så action klassen kan rapportera felet till slack?
@@ -28,16 +28,91 @@ def create_lock(user_id, event_date):
     }
     return event
 
+
 class Event:
-    # Work in progress, not used.
+    """
+    A timereport event, as sent to and received from the backend.
+    event_date is a string (2019-01-01).
+    """
 
-    def __init__(self, user_id, user_name, reason, event_date, hours, fmt):
+    __slots__ = ('user_id', 'user_name', 'reason', 'event_date', 'hours', 'lock')
+
+    def __init__(self, user_id=None, user_name=None, reason=None, event_date=None, hours=8, lock=False):
         self.user_id = user_id
         self.user_name = user_name
         self.reason = reason
         self.event_date = event_date
         self.hours = hours
-        self.fmt = fmt
+        self.lock = lock
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Create an event from a backend document
+
+        :data: dict
+        :return: Event
+        """
+        hours = data.get('hours')
+        try:
+            hours = float(hours or 0)
+        except (TypeError, ValueError):
+            log.debug(f"Unexpected hours in event: {data}")
+            hours = 0.0
+        return cls(
+            user_id=data.get('user_id'),
+            user_name=data.get('user_name'),
+            reason=data.get('reason'),
+            event_date=str(data.get('event_date', ''))[:10],
+            hours=hours,
+            lock=bool(data.get('lock')),
+        )
+
+    def to_dict(self):
+        """
+        The backend document for the event. Unset fields are left out.
+        """
+        data = {}
+        for field in ('user_id', 'user_name', 'reason', 'event_date', 'hours'):
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        if self.lock:
+            data['lock'] = True
+        return data
 
     def to_json(self):
-        return json.dumps(vars(self))
\ No newline at end of file
+        return json.dumps(self.to_dict())
+
+    def __eq__(self, other):
+        if not isinstance(other, Event):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f'{field}={getattr(self, field)!r}' for field in self.__slots__)
+        return f'Event({fields})'
+
+
+def events_to_json(events):
+    """
+    Serialise a list of events to a json list
+
+    :events: List of Event
+    :return: string
+    """
+    return f"[{', '.join(event.to_json() for event in events)}]"
+
+
+def iter_events(list_data):
+    """
+    Parse the json list from the backend
+
+    :list_data: The response text from the backend, a json list of events
+    :return: iterator of Event
+    :raises ValueError: If list_data isn't a json list of objects
+    """
+    items = json.loads(list_data)
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError(f"Expected a json list of events, got: {list_data[:200]}")
+    return (Event.from_dict(item) for item in items)
@@ -0,0 +1,18 @@
+import pytest
+from chalicelib.lib import client, lock, slack
+from chalicelib.lib import list as list_lib
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    The caches, circuit breakers and rate limiter live at module scope, so clear them between tests
+    """
+    yield
+    lock.lock_index.clear()
+    list_lib.list_cache.clear()
+    slack.dm_channel_cache.clear()
+    slack.non_person_cache.clear()
+    slack.seen_signatures.clear()
+    client._breakers.clear()
+    slack.configure_rate_limiter()
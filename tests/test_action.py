@@ -1,8 +1,12 @@
 import pytest
-from mockito import when, mock, unstub
-import botocore.vendored.requests.api as requests
+from mockito import when, mock, unstub, verify, ANY
+from chalicelib.lib import client
 from chalicelib.action import Action
+from chalicelib import commands
+from chalicelib.lib.lock import mark_locked, lock_index
+from chalicelib.lib.slack import delete_message_menu, RateLimited
 from datetime import datetime
+from calendar import monthrange
 from . import test_data
 import json
 
@@ -41,17 +45,26 @@ def test_perform_add_action():
     action.date_start = "2019-01-01"
     action.date_end = "2019-01-01"
     when(action).send_response(message="").thenReturn()
-    when(requests).get(
+    when(client).get(
         url=f"{fake_config['backend_url']}/event/users/{action.user_id}", 
         params={
-            "startDate": action.date_start,
-            "endDate": action.date_end,
+            "startDate": "2019-01-01",
+            "endDate": "2019-01-31",
         }
     ).thenReturn(mock({"status_code": 200, "text": '[{"lock": false}]'}))
     assert action.perform_action() == ""
     unstub()
 
 
+def test_perform_add_action_no_working_days():
+    fake_payload["text"] = ["add vab 2019-12-24:2019-12-26"]
+    fake_payload["user_name"] = "fake username"
+    action = Action(fake_payload, dict(fake_config, working_days_only=True))
+    when(action).send_response(message="No working days to add in 2019-12-24:2019-12-26").thenReturn("")
+    assert action.perform_action() == ""
+    unstub()
+
+
 def test_perform_delete_action():
     fake_payload["text"] = ["delete 2019-01-01"]
     fake_payload["user_name"] = "fake_username"
@@ -61,6 +74,25 @@ def test_perform_delete_action():
     unstub()
 
 
+def test_perform_delete_action_month_shows_range():
+    fake_payload["text"] = ["delete 2019-02"]
+    fake_payload["user_name"] = "fake_username"
+    action = Action(fake_payload, fake_config)
+    when(action).send_attachment(
+        attachment=delete_message_menu("f", "2019-02-01:2019-02-28")
+    ).thenReturn("")
+    assert action.perform_action() == ""
+    unstub()
+
+
+def test_perform_delete_action_invalid_date():
+    fake_payload["text"] = ["delete 2019-13-01"]
+    action = Action(fake_payload, fake_config)
+    when(action).send_response(message="Sorry, 2019-13-01 is not a valid date").thenReturn("")
+    assert action.perform_action() == ""
+    unstub()
+
+
 def test_perform_help_action():
     fake_payload["text"] = ["help"]
     fake_payload["user_name"] = "fake_username"
@@ -80,19 +112,42 @@ def test_perform_empty_action():
     unstub()
 
 
+fake_list_data = json.dumps([
+    {"event_date": "2019-01-01", "reason": "vab", "hours": 8, "user_id": "fake_userid"},
+    {"event_date": "2019-01-02", "reason": "sjuk", "hours": "4", "user_id": "fake_userid"},
+])
+
+
 def test_perform_list_action():
     fake_payload["text"] = ["list"]
     fake_payload["user_name"] = "fake_username"
     action = Action(fake_payload, fake_config)
     
-    when(action).send_response(message="fake list output").thenReturn("")
-    when(requests).get(
+    when(action).send_response(
+        message="*2019-01-01 - 2019-01-02*: 2 days, 12 hours\n"
+        "*Per reason*\nsjuk: 4 h\nvab: 8 h\n"
+        "*Per week*\n2019-W01: 12 h"
+    ).thenReturn("")
+    when(client).get(
         url=f"{fake_config['backend_url']}/event/users/fake_userid", 
         params={
             "startDate": datetime.now().strftime("%Y-%m-01"),
-            "endDate": datetime.now().strftime("%Y-%m-31"),
+            "endDate": datetime.now().strftime(f"%Y-%m-{monthrange(datetime.now().year, datetime.now().month)[1]}"),
         }
-    ).thenReturn(mock({"status_code": 200, "text": "fake list output"}))
+    ).thenReturn(mock({"status_code": 200, "text": fake_list_data}))
+    assert action.perform_action() == ""
+    unstub()
+
+
+def test_perform_list_detail_action():
+    fake_payload["text"] = ["list 2019-01 detail"]
+    action = Action(fake_payload, fake_config)
+
+    when(action).send_response(message="2019-01-01 vab 8 h\n2019-01-02 sjuk 4 h").thenReturn("")
+    when(client).get(
+        url=f"{fake_config['backend_url']}/event/users/fake_userid",
+        params={"startDate": "2019-01-01", "endDate": "2019-01-31"},
+    ).thenReturn(mock({"status_code": 200, "text": fake_list_data}))
     assert action.perform_action() == ""
     unstub()
 
@@ -102,26 +157,172 @@ def test_perform_lock_check():
     action.user_id = "fake_user"
     action.date_start = "2019-01-01"
     action.date_end = "2019-01-02"
-    when(requests).get(
+    when(client).get(
         url=f"{fake_config['backend_url']}/event/users/{action.user_id}", 
         params={
-            "startDate": action.date_start,
-            "endDate": action.date_end,
+            "startDate": "2019-01-01",
+            "endDate": "2019-01-31",
         }
     ).thenReturn(mock({"status_code": 200, "text":'[{"lock":false}]'}))
     test = action.check_lock_state()
     assert test is False
     unstub()
 
+
+def test_perform_lock_check_cached():
+    fake_payload["text"] = ["fake"]
+    action = Action(fake_payload, fake_config)
+    action.user_id = "fake_user"
+    action.date_start = "2019-01-30"
+    action.date_end = "2019-02-02"
+    mark_locked("fake_user", "2019-02")
+    when(client).get(
+        url=f"{fake_config['backend_url']}/event/users/{action.user_id}",
+        params={
+            "startDate": "2019-01-01",
+            "endDate": "2019-01-31",
+        }
+    ).thenReturn(mock({"status_code": 200, "text": '[{"lock": false}]'}))
+    assert action.check_lock_state() is True
+    unstub()
+    # Both months are in the lock index now, so no backend call is needed
+    assert action.check_lock_state() is True
+
+def test_perform_lock_check_failed():
+    fake_payload["text"] = ["fake"]
+    action = Action(fake_payload, fake_config)
+    action.user_id = "fake_user"
+    action.date_start = "2019-03-01"
+    action.date_end = "2019-03-31"
+    when(client).get(
+        url=f"{fake_config['backend_url']}/event/users/{action.user_id}",
+        params={"startDate": "2019-03-01", "endDate": "2019-03-31"},
+    ).thenReturn(mock({"status_code": 500}))
+    assert action.check_lock_state() is None
+    # Failed lookups are not cached
+    assert lock_index.get(("fake_user", "2019-03")) is None
+    unstub()
+
+
+def test_perform_lock_check_error_object():
+    fake_payload["text"] = ["fake"]
+    action = Action(fake_payload, fake_config)
+    action.user_id = "fake_user"
+    action.date_start = "2019-03-01"
+    action.date_end = "2019-03-31"
+    when(client).get(
+        url=f"{fake_config['backend_url']}/event/users/{action.user_id}",
+        params={"startDate": "2019-03-01", "endDate": "2019-03-31"},
+    ).thenReturn(mock({"status_code": 200, "text": '{"message": "Internal"}'}))
+    assert action.check_lock_state() is None
+    assert lock_index.get(("fake_user", "2019-03")) is None
+    unstub()
+
+
+def test_perform_add_action_lock_unknown():
+    fake_payload["text"] = ["add vab 2019-03-01"]
+    fake_payload["user_name"] = "fake username"
+    action = Action(fake_payload, fake_config)
+    when(action).check_lock_state().thenReturn(None)
+    when(action).send_response(
+        message="Could not verify the lock state of the events, please try again later"
+    ).thenReturn("")
+    assert action.perform_action() == ""
+    unstub()
+
+
 def test_perform_lock():
     fake_payload["text"] = ["lock 2019-01"]
     action = Action(fake_payload, fake_config)
     action.user_id = "fake_userid"
     when(action).send_response(message='Lock successful! :lock: :+1:').thenReturn()
-    when(requests).post(
+    when(client).post(
         url=f"{fake_config['backend_url']}/lock",
         data=json.dumps({'user_id': 'fake_userid', 'event_date': '2019-01'}),
         headers={'Content-Type': 'application/json'},
+        idempotent=True,
     ).thenReturn(mock({"status_code": 200}))
     assert action.perform_action() == ""
-    unstub()
\ No newline at end of file
+    assert lock_index.get(("fake_userid", "2019-01")) is True
+    unstub()
+
+def test_perform_lock_invalid_month():
+    fake_payload["text"] = ["lock 2019-01-01"]
+    action = Action(fake_payload, fake_config)
+    when(action).send_response(
+        message="Sorry, 2019-01-01 is not a month. Usage: /timereport lock 2019-08"
+    ).thenReturn("")
+    assert action.perform_action() == ""
+    unstub()
+
+
+def test_perform_delete_without_date():
+    fake_payload["text"] = ["delete"]
+    action = Action(fake_payload, fake_config)
+    when(action).send_response(message="Usage: /timereport delete <date>, e.g. 2019-01-01").thenReturn("")
+    assert action.perform_action() == ""
+    unstub()
+
+
+def test_perform_lock_without_month():
+    fake_payload["text"] = ["lock"]
+    action = Action(fake_payload, fake_config)
+    when(action).send_response(message="Usage: /timereport lock <month>, e.g. 2019-08").thenReturn("")
+    assert action.perform_action() == ""
+    unstub()
+
+
+def test_perform_team_requires_manager():
+    fake_payload["text"] = ["team 2019-01"]
+    action = Action(fake_payload, dict(fake_config, team_managers=["fake_manager"]))
+    when(action).send_response(message="Sorry, only team managers can see the team report").thenReturn("")
+    assert action.perform_action() == ""
+    unstub()
+
+
+def test_send_response_rate_limited_falls_back_to_response_url():
+    fake_payload["text"] = ["help"]
+    action = Action(fake_payload, fake_config)
+    action.user_id = "fake_userid"
+    slack = mock({"is_conversation_open": False, "slack_dm_channel": None})
+    when(slack).open_conversation(slack_user_id="fake_userid").thenRaise(RateLimited("conversations.open", 30))
+    action._slack = slack
+    when(client).post(
+        url=fake_payload["response_url"][0],
+        json={"text": "fake message"},
+        headers={"Content-Type": "application/json"},
+    ).thenReturn(mock({"status_code": 200}))
+    assert action.send_response(message="fake message") == ""
+    verify(client, times=1).post(url=fake_payload["response_url"][0], json=ANY, headers=ANY)
+    unstub()
+
+
+def test_perform_action_rate_limited():
+    fake_payload["text"] = ["fake"]
+    commands.register("fake", "tests.test_action")
+    action = Action(fake_payload, fake_config)
+    when(client).post(
+        url=fake_payload["response_url"][0],
+        json={"text": "Slack is busy right now, please try again in a minute"},
+        headers={"Content-Type": "application/json"},
+    ).thenReturn(mock({"status_code": 200}))
+    assert action.perform_action() == ""
+    commands.commands.pop("fake")
+    commands._handlers.pop("fake")
+    unstub()
+
+
+def run(action):
+    raise RateLimited("users.info", 30)
+
+
+def test_send_response_via_url():
+    fake_payload["text"] = ["help"]
+    action = Action(fake_payload, fake_config, respond_via_url=True)
+    when(client).post(
+        url=fake_payload["response_url"][0],
+        json={"text": "fake message"},
+        headers={"Content-Type": "application/json"},
+    ).thenReturn(mock({"status_code": 200}))
+    assert action.send_response(message="fake message") == ""
+    unstub()
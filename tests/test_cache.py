@@ -0,0 +1,47 @@
+from chalicelib.lib.cache import TTLCache, FileCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_get_set():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("fake", "value")
+    assert cache.get("fake") == "value"
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_expires():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("fake", "value")
+    clock.now += 11
+    assert cache.get("fake") is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("one", 1)
+    cache.set("two", 2)
+    cache.get("one")
+    cache.set("three", 3)
+    assert "two" not in cache
+    assert cache.get("one") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_file_cache_persists(tmpdir):
+    path = str(tmpdir.join("cache.json"))
+    cache = FileCache(path, maxsize=2, ttl=10)
+    cache.set("fake", "value")
+    assert FileCache(path, maxsize=2, ttl=10).get("fake") == "value"
+    cache.pop("fake")
+    assert FileCache(path, maxsize=2, ttl=10).get("fake") is None
@@ -0,0 +1,52 @@
+import sys
+import pytest
+from mockito import when, unstub
+from chalicelib import commands
+from chalicelib.action import Action
+
+
+fake_payload = dict(
+    text=["fake"],
+    response_url=["http://fakeurl.nowhere"],
+    user_id=["fake_userid"],
+)
+fake_config = dict(bot_access_token="fake token", backend_url="http://fakebackend.nowhere")
+
+
+def run(action):
+    action.send_response(message=f"fake command {action.params[1:]}")
+    return ""
+
+
+def fail(action):
+    raise ValueError("fake failure")
+
+
+def test_unknown_command():
+    assert commands.get_handler("unknown") is None
+
+
+def test_handler_imported_on_first_use():
+    sys.modules.pop("chalicelib.commands.edit", None)
+    commands._handlers.pop("edit", None)
+    handler = commands.get_handler("edit")
+    assert "chalicelib.commands.edit" in sys.modules
+    assert commands.get_handler("edit") is handler
+
+
+def test_registered_command():
+    commands.register("fake", "tests.test_commands")
+    action = Action(dict(fake_payload, text=["fake argument"]), fake_config)
+    when(action).send_response(message="fake command ['argument']").thenReturn("")
+    assert action.perform_action() == ""
+    assert commands.stats()["fake"]["calls"] >= 1
+    commands.commands.pop("fake")
+    commands._handlers.pop("fake")
+    unstub()
+
+
+def test_command_errors_are_counted():
+    errors = commands.stats().get("failing", {}).get("errors", 0)
+    with pytest.raises(ValueError):
+        commands.run("failing", fail, Action(fake_payload, fake_config))
+    assert commands.stats()["failing"]["errors"] == errors + 1
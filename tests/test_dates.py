@@ -0,0 +1,42 @@
+import pytest
+from datetime import date
+from chalicelib.lib.dates import resolve, resolve_strings, months_in_range, iter_months
+
+
+@pytest.mark.parametrize(
+    "date_str, expected",
+    [
+        ("2019-02", (date(2019, 2, 1), date(2019, 2, 28))),
+        ("2020-02", (date(2020, 2, 1), date(2020, 2, 29))),
+        ("2019-04", (date(2019, 4, 1), date(2019, 4, 30))),
+        ("2019-01-15", (date(2019, 1, 15), date(2019, 1, 15))),
+        ("2019-01-30:2019-02-02", (date(2019, 1, 30), date(2019, 2, 2))),
+        ("2019-01:2019-02", (date(2019, 1, 1), date(2019, 2, 28))),
+        ("2019", (date(2019, 1, 1), date(2019, 12, 31))),
+        ("2019:2020-02", (date(2019, 1, 1), date(2020, 2, 29))),
+        ("today", (date(2019, 6, 1), date(2019, 6, 1))),
+    ],
+)
+def test_resolve(date_str, expected):
+    assert resolve(date_str, today=date(2019, 6, 1)) == expected
+
+
+@pytest.mark.parametrize("date_str", ["2019-02-31", "2019-13", "fake", "2019-02-02:2019-02-01", "19"])
+def test_resolve_invalid(date_str):
+    with pytest.raises(ValueError):
+        resolve(date_str)
+
+
+def test_resolve_strings():
+    assert resolve_strings("2019-02") == ("2019-02-01", "2019-02-28")
+
+
+def test_months_in_range():
+    assert months_in_range("2019-11-30", "2020-02-01") == ["2019-11", "2019-12", "2020-01", "2020-02"]
+    assert months_in_range(date(2019, 1, 1), date(2019, 1, 31)) == ["2019-01"]
+
+
+def test_iter_months():
+    months = iter_months("2019-12-01", "2020-01-01")
+    assert next(months) == "2019-12"
+    assert list(months) == ["2020-01"]
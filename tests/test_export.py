@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import pytest
+from mockito import when, mock, unstub
+from chalicelib.lib import client
+from chalicelib.lib import list as list_lib
+from chalicelib.lib.export import iter_records, write_csv, write_json, export, ExportError
+from chalicelib.model.event import Event
+
+
+fake_url = "http://fakebackend.nowhere"
+
+
+def stub_month(start, end, events, status_code=200):
+    when(client).get(
+        url=f"{fake_url}/event/users/fake", params={"startDate": start, "endDate": end},
+    ).thenReturn(mock({"status_code": status_code, "text": json.dumps(events)}))
+
+
+def fake_event(event_date, reason="vab"):
+    return {"user_id": "fake", "user_name": "fake", "event_date": event_date, "reason": reason, "hours": 8}
+
+
+def test_iter_records_filters_partial_months():
+    stub_month("2019-01-01", "2019-01-31", [fake_event("2019-01-31"), fake_event("2019-01-02")])
+    stub_month("2019-02-01", "2019-02-28", [fake_event("2019-02-01"), fake_event("2019-02-20")])
+    records = iter_records(fake_url, "fake", "2019-01-02:2019-02-10", max_workers=1)
+    assert [event.event_date for event in records] == ["2019-01-02", "2019-01-31", "2019-02-01"]
+    unstub()
+
+
+def test_iter_records_failed_month():
+    stub_month("2019-01-01", "2019-01-31", [], status_code=500)
+    with pytest.raises(ExportError):
+        list(iter_records(fake_url, "fake", "2019-01"))
+    unstub()
+
+
+def test_iter_records_bypasses_list_cache():
+    stub_month("2019-01-01", "2019-01-31", [fake_event("2019-01-02")])
+    assert len(list(iter_records(fake_url, "fake", "2019-01"))) == 1
+    assert len(list_lib.list_cache) == 0
+    unstub()
+
+
+def test_iter_records_unexpected_data():
+    when(client).get(
+        url=f"{fake_url}/event/users/fake", params={"startDate": "2019-01-01", "endDate": "2019-01-31"},
+    ).thenReturn(mock({"status_code": 200, "text": "not json"}))
+    with pytest.raises(ExportError, match="unexpected data"):
+        list(iter_records(fake_url, "fake", "2019-01"))
+    unstub()
+
+
+def test_write_csv():
+    fd = io.StringIO()
+    events = [Event.from_dict(fake_event("2019-01-01")), Event.from_dict(fake_event("2019-01-02", "sjuk"))]
+    assert write_csv(iter(events), fd) == 2
+    assert fd.getvalue().splitlines() == [
+        "user_id,user_name,event_date,reason,hours,lock",
+        "fake,fake,2019-01-01,vab,8.0,",
+        "fake,fake,2019-01-02,sjuk,8.0,",
+    ]
+
+
+def test_write_json():
+    fd = io.StringIO()
+    events = [Event.from_dict(fake_event("2019-01-01")), Event.from_dict(fake_event("2019-01-02"))]
+    assert write_json(iter(events), fd) == 2
+    assert [event["event_date"] for event in json.loads(fd.getvalue())] == ["2019-01-01", "2019-01-02"]
+    fd = io.StringIO()
+    assert write_json(iter([]), fd) == 0
+    assert json.loads(fd.getvalue()) == []
+
+
+def test_export_removes_failed_file(tmpdir):
+    stub_month("2019-01-01", "2019-01-31", [], status_code=500)
+    with pytest.raises(ExportError):
+        export(fake_url, "fake", "2019-01", directory=str(tmpdir))
+    assert os.listdir(str(tmpdir)) == []
+    unstub()
@@ -0,0 +1,115 @@
+import json
+import time
+from benchmarks.fakes import FakeBackend, FakeSlack, Faults
+from chalicelib.lib.add import post_events
+from chalicelib.lib.delete import delete_events
+from chalicelib.lib.list import get_list_data
+from chalicelib.lib.lock import lock_event
+from chalicelib.lib.slack import Slack, slack_client_responder, rate_limit_stats, configure_rate_limiter
+from chalicelib.model.event import Event
+from chalicelib.action import Action
+
+
+def test_fake_backend_round_trip():
+    with FakeBackend() as backend:
+        url = f"{backend.url}/event/users/fake"
+        events = [Event(user_name="fake", reason="vab", event_date=f"2019-01-0{day}", hours=8) for day in (1, 2, 3)]
+        assert post_events(url, events) == []
+        assert delete_events(url, ["2019-01-02", "2019-01-09"]) == ["2019-01-09"]
+        assert lock_event(backend.url, json.dumps({"user_id": "fake", "event_date": "2019-01"})).status_code == 200
+
+        listed = json.loads(get_list_data(backend.url, "fake", "2019-01"))
+        assert [event["event_date"] for event in listed] == ["2019-01-01", "2019-01-03"]
+        assert all(event["lock"] for event in listed)
+        assert backend.calls["POST /event/users/{id}"] == 1
+
+
+def test_fake_backend_without_batches():
+    with FakeBackend(batch_support=False) as backend:
+        url = f"{backend.url}/event/users/fake"
+        events = [Event(user_name="fake", reason="vab", event_date=f"2019-01-0{day}", hours=8) for day in (1, 2)]
+        assert post_events(url, events) == []
+        assert backend.calls["POST /event/users/{id}"] == 3
+
+
+def test_fake_backend_errors():
+    with FakeBackend(Faults(error_rate=1.0)) as backend:
+        assert get_list_data(backend.url, "fake", "2019-01") is False
+        # Gets are retried before giving up
+        assert backend.rejected["GET /event/users/{id}"] == 3
+
+
+def test_fake_slack():
+    # Long enough to wait out the Retry-After of the fake
+    configure_rate_limiter(max_wait=2)
+    with FakeSlack(Faults(rate_limit=1)) as fake_slack:
+        slack = Slack(slack_token="fake", base_url=fake_slack.api_url)
+        slack.open_conversation(slack_user_id="UFAKE")
+        assert slack.slack_dm_channel == "DUFAKE"
+        slack.send_message("fake message")
+        assert fake_slack.messages[("DUFAKE", slack.slack_timestamp)] == "fake message"
+
+        first = slack_client_responder("fake", "DUFAKE", [], url=f"{fake_slack.api_url}chat.update")
+        second = slack_client_responder("fake", "DUFAKE", [], url=f"{fake_slack.api_url}chat.update")
+        assert first.status_code == 200
+        # Slack answered 429, so the call waited for Retry-After and was sent again
+        assert second.status_code == 200
+        assert fake_slack.rejected["POST /api/chat.update"] == 1
+        assert rate_limit_stats()["chat.update"]["rate_limited"] == 1
+
+
+def test_export_upload():
+    with FakeBackend() as backend, FakeSlack() as fake_slack:
+        url = f"{backend.url}/event/users/fake"
+        events = [Event(user_name="fake", reason="vab", event_date=f"2019-0{month}-01", hours=8) for month in (1, 3)]
+        assert post_events(url, events) == []
+
+        config = {
+            "backend_url": backend.url, "bot_access_token": "fake", "slack_api_url": fake_slack.api_url,
+        }
+        payload = {"text": ["export 2019-01:2019-04"], "user_id": ["fake"], "response_url": [fake_slack.response_url()]}
+        assert Action(payload, config).perform_action() == ""
+        assert backend.calls["GET /event/users/{id}"] == 4
+        assert len(fake_slack.uploads) == 1
+        assert b"2019-03-01,vab" in fake_slack.uploads[0]
+
+
+def test_team_report():
+    with FakeBackend() as backend, FakeSlack() as fake_slack:
+        fake_slack.channels["CTEAM"] = ["UFIRST", "USECOND", "UTHIRD", "UBOT", "USLACKBOT"]
+        fake_slack.bots.add("UBOT")
+        url = f"{backend.url}/event/users/UFIRST"
+        assert post_events(url, [Event(user_name="first", reason="vab", event_date="2019-01-02", hours=8)]) == []
+
+        config = {
+            "backend_url": backend.url, "bot_access_token": "fake", "slack_api_url": fake_slack.api_url,
+            "team_managers": ["fake"],
+        }
+        payload = {
+            "text": ["team 2019-01 <#CTEAM|team>"], "user_id": ["fake"], "response_url": [fake_slack.response_url()],
+        }
+        assert Action(payload, config, respond_via_url=True).perform_action() == ""
+        assert backend.calls["GET /event/users/{id}"] == 3
+        message = fake_slack.responses[0]["text"]
+        assert message.startswith("*2019-01*: 3 users, 8 hours, 22 working days")
+        assert ":warning: 3 users have missing working days" in message
+
+
+def test_team_report_large_channel():
+    with FakeBackend() as backend, FakeSlack() as fake_slack:
+        fake_slack.channels["CTEAM"] = [f"U{number:03d}" for number in range(100)] + ["UBOT"]
+        fake_slack.bots.add("UBOT")
+        config = {
+            "backend_url": backend.url, "bot_access_token": "fake", "slack_api_url": fake_slack.api_url,
+            "team_managers": ["fake"],
+        }
+        payload = {
+            "text": ["team 2019-01 <#CTEAM|team>"], "user_id": ["fake"], "response_url": [fake_slack.response_url()],
+        }
+        start = time.monotonic()
+        assert Action(payload, config, respond_via_url=True).perform_action() == ""
+        assert time.monotonic() - start < 10
+        # One users.list page, not one lookup per member
+        assert fake_slack.calls["POST /api/users.list"] == 1
+        assert backend.calls["GET /event/users/{id}"] == 100
+        assert fake_slack.responses[0]["text"].startswith("*2019-01*: 100 users")
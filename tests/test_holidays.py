@@ -0,0 +1,38 @@
+import pytest
+from datetime import date
+from chalicelib.lib.holidays import easter_sunday, swedish_holidays, working_days, count_working_days
+
+
+@pytest.mark.parametrize(
+    "year, expected", [(2019, date(2019, 4, 21)), (2020, date(2020, 4, 12)), (2024, date(2024, 3, 31))]
+)
+def test_easter_sunday(year, expected):
+    assert easter_sunday(year) == expected
+
+
+def test_swedish_holidays():
+    holidays = swedish_holidays(2019)
+    for holiday in (date(2019, 4, 19), date(2019, 5, 30), date(2019, 6, 21), date(2019, 11, 2), date(2019, 12, 24)):
+        assert holiday in holidays
+
+
+def test_working_days_over_new_year():
+    days = list(working_days(date(2019, 12, 20), date(2020, 1, 7)))
+    assert days == [
+        date(2019, 12, 20), date(2019, 12, 23), date(2019, 12, 27), date(2019, 12, 30),
+        date(2020, 1, 2), date(2020, 1, 3), date(2020, 1, 7),
+    ]
+
+
+def test_working_days_extra_holidays():
+    days = list(working_days(date(2019, 12, 20), date(2019, 12, 23), extra_holidays=["2019-12-23"]))
+    assert days == [date(2019, 12, 20)]
+
+
+def test_working_days_no_calendar():
+    assert count_working_days(date(2019, 12, 23), date(2019, 12, 27), calendar="none") == 5
+
+
+def test_unsupported_calendar():
+    with pytest.raises(ValueError):
+        list(working_days(date(2019, 1, 1), date(2019, 1, 2), calendar="fake"))
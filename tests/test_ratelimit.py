@@ -0,0 +1,133 @@
+from chalicelib.lib.ratelimit import TokenBucket, RateLimiter, RateLimited, retry_after
+from mockito import mock
+import pytest
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_burst_then_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(per_minute=60, burst=2, clock=clock)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # Reservations queue up behind each other
+    assert bucket.reserve() == pytest.approx(1)
+    assert bucket.reserve() == pytest.approx(2)
+
+
+def test_token_bucket_pause():
+    clock = FakeClock()
+    bucket = TokenBucket(per_minute=600, burst=5, clock=clock)
+    bucket.pause(3)
+    assert bucket.reserve() == pytest.approx(3)
+    clock.now = 4
+    assert bucket.reserve() == 0
+
+
+def test_retry_after():
+    assert retry_after(mock({"status_code": 200})) is None
+    assert retry_after(mock({"status_code": 429, "headers": {"Retry-After": "2"}})) == 2
+    error = Exception("rate limited")
+    error.response = mock({"status_code": 429, "headers": {}})
+    assert retry_after(error) == 1
+    assert retry_after({"ok": True}) is None
+
+
+def test_rate_limiter_throttles():
+    clock = FakeClock()
+    limiter = RateLimiter(limits={"chat.update": (60, 1)}, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        assert limiter.call("chat.update", lambda: "ok") == "ok"
+    assert clock.slept == [pytest.approx(1), pytest.approx(1)]
+    stats = limiter.stats()["chat.update"]
+    assert stats["calls"] == 3
+    assert stats["throttled"] == 2
+
+
+def test_rate_limiter_honours_retry_after():
+    clock = FakeClock()
+    limiter = RateLimiter(max_wait=10, clock=clock, sleep=clock.sleep)
+    responses = iter([
+        mock({"status_code": 429, "headers": {"Retry-After": "5"}}),
+        mock({"status_code": 200}),
+    ])
+    assert limiter.call("chat.postMessage", lambda: next(responses)).status_code == 200
+    assert clock.slept == [pytest.approx(5)]
+    assert limiter.stats()["chat.postMessage"]["rate_limited"] == 1
+
+
+def test_rate_limiter_gives_up():
+    clock = FakeClock()
+    limiter = RateLimiter(max_retries=1, max_wait=10, clock=clock, sleep=clock.sleep)
+    error = Exception("rate limited")
+    error.response = mock({"status_code": 429, "headers": {"Retry-After": "1"}})
+
+    def rate_limited():
+        raise error
+
+    with pytest.raises(RateLimited):
+        limiter.call("conversations.open", rate_limited)
+    assert limiter.stats()["conversations.open"]["calls"] == 2
+
+
+def test_rate_limiter_rejects_long_waits():
+    clock = FakeClock()
+    limiter = RateLimiter(limits={"files.upload": (6, 1)}, max_wait=2, clock=clock, sleep=clock.sleep)
+    assert limiter.call("files.upload", lambda: "ok") == "ok"
+    with pytest.raises(RateLimited):
+        limiter.call("files.upload", lambda: "not called")
+    assert clock.slept == []
+    assert limiter.stats()["files.upload"]["rejected"] == 1
+    # The rejected call gave its token back
+    clock.now = 10
+    assert limiter.call("files.upload", lambda: "ok") == "ok"
+    assert clock.slept == []
+
+
+def test_rate_limiter_does_not_retry_before_retry_after():
+    clock = FakeClock()
+    limiter = RateLimiter(max_wait=2, clock=clock, sleep=clock.sleep)
+    calls = []
+
+    def rate_limited():
+        calls.append(clock.now)
+        return mock({"status_code": 429, "headers": {"Retry-After": "60"}})
+
+    with pytest.raises(RateLimited):
+        limiter.call("chat.update", rate_limited)
+    assert calls == [0]
+    assert clock.slept == []
+
+
+def test_rate_limiter_deferred_waits_for_retry_after():
+    clock = FakeClock()
+    limiter = RateLimiter(max_wait=1, deferred_max_wait=60, clock=clock, sleep=clock.sleep)
+    responses = iter([
+        mock({"status_code": 429, "headers": {"Retry-After": "30"}}),
+        mock({"status_code": 200}),
+    ])
+    with limiter.deferred():
+        assert limiter.call("chat.update", lambda: next(responses)).status_code == 200
+    assert clock.slept == [pytest.approx(30)]
+    assert limiter.current_max_wait() == 1
+
+
+def test_rate_limiter_bounds_total_wait():
+    clock = FakeClock()
+    limiter = RateLimiter(max_wait=2, clock=clock, sleep=clock.sleep)
+    rate_limited = mock({"status_code": 429, "headers": {"Retry-After": "1.5"}})
+    with pytest.raises(RateLimited):
+        limiter.call("chat.postMessage", lambda: rate_limited)
+    assert clock.slept == [pytest.approx(1.5)]
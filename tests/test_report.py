@@ -0,0 +1,88 @@
+import json
+from chalicelib.lib.report import (
+    summarize, render_summary, render_detail, truncate, summarize_team, render_team,
+)
+from chalicelib.model.event import Event, iter_events
+
+
+fake_list_data = json.dumps([
+    {"event_date": "2019-07-31", "reason": "vab", "hours": 8, "lock": True},
+    {"event_date": "2019-08-01", "reason": "vab", "hours": "8"},
+    {"event_date": "2019-08-05", "reason": "semester", "hours": 4.5},
+])
+
+
+def test_summarize():
+    summary = summarize(iter_events(fake_list_data))
+    assert summary["first"] == "2019-07-31"
+    assert summary["last"] == "2019-08-05"
+    assert summary["hours"] == 20.5
+    assert summary["reasons"] == {"vab": 16, "semester": 4.5}
+    assert summary["weeks"] == {"2019-W31": 16, "2019-W32": 4.5}
+    assert summary["months"] == {"2019-07": 8, "2019-08": 12.5}
+    assert summary["locked"] == ["2019-07"]
+
+
+def test_summarize_skips_invalid_dates():
+    records = list(iter_events(fake_list_data)) + [Event(event_date="", reason="vab", hours=8.0)]
+    summary = summarize(records)
+    assert summary["hours"] == 20.5
+    assert summary["skipped"] == 1
+    assert "Skipped 1 events without a valid date" in render_summary(summary)
+
+
+def test_render_summary():
+    message = render_summary(summarize(iter_events(fake_list_data)))
+    assert message.startswith("*2019-07-31 - 2019-08-05*: 3 days, 20.5 hours")
+    assert "*Per month*" in message
+    assert ":lock: Locked: 2019-07" in message
+
+
+def test_render_detail_is_bounded():
+    records = [Event(event_date=f"2019-01-{day:02d}", reason="vab", hours=8.0) for day in range(31, 0, -1)]
+    message = render_detail(records, max_length=200)
+    assert len(message) <= 200
+    assert message.startswith("2019-01-01 vab 8 h")
+    assert message.endswith("more lines")
+
+
+def test_truncate_keeps_short_messages():
+    assert truncate(["one", "two"]) == "one\ntwo"
+
+
+def fake_team():
+    first = [
+        Event(user_name="kamger", reason="vab", event_date="2019-01-02", hours=8),
+        Event(user_name="kamger", reason="sjuk", event_date="2019-01-03", hours=4),
+    ]
+    second = [Event(user_name="Anna", reason="vab", event_date=day, hours=8) for day in ("2019-01-02", "2019-01-03")]
+    return summarize_team(
+        [("UFIRST", first), ("USECOND", second), ("UFAILED", None)], ["2019-01-02", "2019-01-03", "2019-01-04"]
+    )
+
+
+def test_summarize_team():
+    summary = fake_team()
+    assert [user["name"] for user in summary["users"]] == ["Anna", "kamger"]
+    assert summary["users"][1]["reasons"] == {"vab": 8, "sjuk": 4}
+    assert summary["users"][1]["missing"] == ["2019-01-04"]
+    assert summary["reasons"] == {"vab": 24, "sjuk": 4}
+    assert summary["failed"] == ["UFAILED"]
+
+
+def test_render_team():
+    message = render_team(fake_team(), "2019-01")
+    lines = message.splitlines()
+    assert lines[0] == "*2019-01*: 2 users, 28 hours, 3 working days"
+    assert lines[1].split() == ["```user", "sjuk", "vab", "total", "missing"]
+    assert lines[3].split() == ["kamger", "4", "8", "12", "1```"]
+    assert ":warning: 2 users have missing working days" in message
+    assert ":x: Could not fetch 1 users: UFAILED" in message
+
+
+def test_render_team_truncated():
+    users = [(f"U{number}", [Event(user_name=f"user{number}", reason="vab", event_date="2019-01-02", hours=8)])
+             for number in range(200)]
+    message = render_team(summarize_team(users, ["2019-01-02"]), "2019-01")
+    assert len(message) <= 3000
+    assert message.count("```") == 2
@@ -1,11 +1,13 @@
 import os
-from mockito import when, mock, unstub
+from mockito import when, mock, unstub, verify
 from .test_data import fake_request_body
-import botocore.vendored.requests.api as requests
+from chalicelib.lib import client
 from chalicelib.lib.slack import (
     slack_payload_extractor, verify_token,
     submit_message_menu, delete_message_menu,
-    slack_client_responder, slack_responder, Slack
+    slack_client_responder, slack_responder, Slack,
+    dm_channel_cache, verify_request, seen_signatures, payload_team_id, bot_token,
+    REQUEST_VALID, REQUEST_INVALID, REQUEST_STALE, REQUEST_DUPLICATE,
 )
 
 
@@ -34,11 +36,37 @@ def test_signing_secret():
     assert verify_token(fake_request_headers, fake_request_body, fake_test_token) is True
 
 
+fake_signed_headers = {
+    'X-Slack-Request-Timestamp': '1531420618',
+    'X-Slack-Signature': 'v0=a2114d57b48eac39b9ad189dd8316235a7b4a8d21a10bd27519666489c69b503',
+}
+fake_signing_secret = '8f742231b10e8888abcd99yyyzzz85a5'
+
+
+def test_verify_request():
+    seen_signatures.clear()
+    now = 1531420618 + 10
+    assert verify_request(fake_signed_headers, fake_request_body.encode(), fake_signing_secret, now=now) == REQUEST_VALID
+    assert verify_request(fake_signed_headers, fake_request_body, fake_signing_secret, now=now) == REQUEST_DUPLICATE
+    seen_signatures.clear()
+
+
+def test_verify_request_invalid():
+    seen_signatures.clear()
+    now = 1531420618 + 10
+    assert verify_request(fake_signed_headers, fake_request_body, 'faultyfaketoken', now=now) == REQUEST_INVALID
+    assert verify_request({}, fake_request_body, fake_signing_secret, now=now) == REQUEST_INVALID
+    assert verify_request(fake_signed_headers, fake_request_body, fake_signing_secret, now=now + 600) == REQUEST_STALE
+    retry_headers = dict(fake_signed_headers, **{'X-Slack-Retry-Num': '1'})
+    assert verify_request(retry_headers, fake_request_body, fake_signing_secret, now=now) == REQUEST_DUPLICATE
+    assert len(seen_signatures) == 0
+
+
 def test_slack_client_responder():
     fake_url = 'http://fake.com'
     fake_data = {'channel': 'fake', 'text': 'From timereport', 'attachments': 'fake'}
     fake_headers = {'Content-Type': 'application/json; charset=utf-8', 'Authorization': 'Bearer fake'}
-    when(requests).post(
+    when(client).post(
         url=fake_url, json=fake_data, headers=fake_headers
     ).thenReturn(mock({'status_code': 200, 'text': '{"ok": "true", "message_ts": "xxxxx"}'}))
 
@@ -57,7 +85,7 @@ def test_slack_client_responder_failure():
     fake_url = 'http://fake_slack_url.com'
     fake_data = {'channel': 'fake', 'text': 'From timereport', 'attachments': 'fake'}
     fake_headers = {'Content-Type': 'application/json; charset=utf-8', 'Authorization': 'Bearer fake'}
-    when(requests).post(
+    when(client).post(
         url=fake_url, json=fake_data, headers=fake_headers
     ).thenReturn(mock({'status_code': 500}))
 
@@ -72,7 +100,7 @@ def test_slack_client_responder_failure():
 
 
 def test_slack_responder():
-    when(requests).post(
+    when(client).post(
         url='fake', json={'text': 'fake message'}, headers={'Content-Type': 'application/json'}
     ).thenReturn(mock({'status_code': 200}))
     assert slack_responder(url='fake', msg='fake message') == 200
@@ -110,4 +138,70 @@ def test_delete_menu():
 def test_slack_class():
     test = Slack(slack_token="fake_token")
     assert test.slack_token
-    assert test.client
\ No newline at end of file
+    assert test.client
+
+def test_slack_open_conversation_cached():
+    dm_channel_cache.clear()
+    test = Slack(slack_token="fake_token")
+    when(test.client).conversations_open(users=["fake_user"]).thenReturn(
+        {"channel": {"id": "fake_channel"}, "already_open": False}
+    )
+    test.open_conversation(slack_user_id="fake_user")
+    unstub()
+
+    second = Slack(slack_token="fake_token")
+    when(second.client).conversations_open(users=["fake_user"]).thenRaise(Exception("should be cached"))
+    second.open_conversation(slack_user_id="fake_user")
+    assert second.slack_dm_channel == "fake_channel"
+    assert second.is_conversation_open
+    unstub()
+    dm_channel_cache.clear()
+
+
+def test_slack_responder_replace_original():
+    when(client).post(
+        url='fake',
+        json={'text': 'fake message', 'replace_original': True},
+        headers={'Content-Type': 'application/json'},
+    ).thenReturn(mock({'status_code': 200}))
+    assert slack_responder(url='fake', msg='fake message', replace_original=True) == 200
+    unstub()
+
+
+def test_slack_conversations_share_api():
+    first = Slack(slack_token="fake_token", channel="fake_channel", ts="1.0")
+    second = Slack(slack_token="fake_token")
+    assert first.api is second.api
+    assert first.is_conversation_open
+    assert second.slack_dm_channel is None
+
+
+def test_slack_conversations_keep_own_state():
+    first = Slack(slack_token="fake_token", channel="first_channel", ts="1.0")
+    second = Slack(slack_token="fake_token", channel="second_channel", ts="2.0")
+    when(first.client).chat_update(channel="first_channel", text="first", ts="1.0").thenReturn({"ok": True})
+    when(first.client).chat_update(channel="second_channel", text="second", ts="2.0").thenReturn({"ok": True})
+    second.update_message("second")
+    first.update_message("first")
+    verify(first.client).chat_update(channel="first_channel", text="first", ts="1.0")
+    verify(first.client).chat_update(channel="second_channel", text="second", ts="2.0")
+    unstub()
+
+
+def test_slack_api_per_workspace():
+    first = Slack(slack_token="fake_token", team_id="TFIRST")
+    assert Slack(slack_token="fake_token", team_id="TFIRST").client is first.client
+    assert Slack(slack_token="fake_token", team_id="TSECOND").client is not first.client
+
+
+def test_bot_token():
+    config = {"bot_access_token": "fake_default", "bot_access_tokens": {"TFIRST": "fake_first"}}
+    assert bot_token(config, "TFIRST") == "fake_first"
+    assert bot_token(config, "TOTHER") == "fake_default"
+    assert bot_token({"bot_access_token": "fake_default"}) == "fake_default"
+
+
+def test_payload_team_id():
+    assert payload_team_id(slack_payload_extractor(fake_request_body)) == "T1DC2JH3J"
+    assert payload_team_id({"team": {"id": "T2FG58LDV"}}) == "T2FG58LDV"
+    assert payload_team_id({}) is None
@@ -0,0 +1,52 @@
+import json
+from mockito import when, mock, unstub
+from chalicelib.lib import client
+from chalicelib.lib import list as list_lib
+from chalicelib.lib.team import fetch_team
+
+
+fake_url = "http://fakebackend.nowhere"
+
+
+def stub_user(user_id, status_code=200):
+    when(client).get(
+        url=f"{fake_url}/event/users/{user_id}", params={"startDate": "2019-01-01", "endDate": "2019-01-31"},
+    ).thenReturn(mock({"status_code": status_code, "text": json.dumps([
+        {"user_id": user_id, "event_date": "2019-01-02", "reason": "vab", "hours": 8},
+    ])}))
+
+
+def test_fetch_team():
+    stub_user("UFIRST")
+    stub_user("UFAILED", status_code=500)
+    results, skipped = fetch_team(fake_url, ["UFIRST", "UFAILED"], "2019-01")
+    assert [user_id for user_id, _ in results] == ["UFIRST", "UFAILED"]
+    assert results[0][1][0].event_date == "2019-01-02"
+    assert results[1][1] is None
+    assert skipped == []
+    assert len(list_lib.list_cache) == 0
+    unstub()
+
+
+def test_fetch_team_budget():
+    for user_id in ("U1", "U2", "U3"):
+        stub_user(user_id)
+    now = [0]
+
+    def clock():
+        # Every window takes ten seconds
+        now[0] += 10
+        return now[0]
+
+    results, skipped = fetch_team(fake_url, ["U1", "U2", "U3"], "2019-01", max_workers=1, budget=25, clock=clock)
+    assert [user_id for user_id, _ in results] == ["U1", "U2"]
+    assert skipped == ["U3"]
+    unstub()
+
+
+def test_fetch_team_budget_started_earlier():
+    stub_user("U1")
+    results, skipped = fetch_team(fake_url, ["U1"], "2019-01", budget=5, started=0, clock=lambda: 10)
+    assert results == []
+    assert skipped == ["U1"]
+    unstub()
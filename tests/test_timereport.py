@@ -1,13 +1,18 @@
 import os
 import pytest
-from chalicelib.lib.helpers import parse_config
+from chalicelib.lib.helpers import parse_config, compile_config, load_config
 from chalicelib.lib.factory import factory, json_factory, date_to_string
-from chalicelib.lib.add import post_event
-from chalicelib.lib.list import get_list_data
-from chalicelib.model.event import create_lock
-from mockito import when, mock, unstub
-import botocore.vendored.requests.api as requests
+from chalicelib.lib.add import post_event, post_events
+from chalicelib.lib.delete import delete_events
+from chalicelib.lib.dispatch import fan_out
+from chalicelib.lib.list import get_list_data, invalidate, cache_stats
+from chalicelib.model.event import create_lock, Event, iter_events, events_to_json
+from mockito import when, mock, unstub, verify, ANY
+from chalicelib.lib import client
 from datetime import datetime
+from calendar import monthrange
+import json
+import time
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
 fake_user_url = "http://fake.nowhere/event/users/fake_userid"
@@ -20,6 +25,17 @@ def test_parsing_config():
         assert test_config.get(option) is not None
 
 
+def test_load_config_snapshot(tmpdir):
+    path = tmpdir.join("config.yaml")
+    path.write("log_level: DEBUG\n")
+    assert load_config(str(path)) == {"log_level": "DEBUG"}
+
+    json_path = compile_config(str(path))
+    assert json_path == str(tmpdir.join("config.json"))
+    tmpdir.join("config.json").write('{"log_level": "INFO"}')
+    assert load_config(str(path)) == {"log_level": "INFO"}
+
+
 @pytest.mark.parametrize(
     "date_string",
     ["2018-01-01", "today", "today 8", "today 24", "2019-01-01:2019-02-01"],
@@ -34,11 +50,12 @@ def test_factory(date_string):
     fake_result = factory(fake_order)
     assert isinstance(fake_result, list)
     test_data = fake_result.pop()
-    assert isinstance(test_data.get("event_date"), str)
+    assert isinstance(test_data, Event)
+    assert isinstance(test_data.event_date, str)
     for item in ("user_id", "user_name", "reason"):
-        assert isinstance(test_data[item], str)
+        assert isinstance(getattr(test_data, item), str)
 
-    assert int(test_data["hours"]) <= 8
+    assert int(test_data.hours) <= 8
 
 
 def test_wrong_hours_data_type():
@@ -61,7 +78,7 @@ def test_wrong_number_of_args_for_add(args_list):
 def test_create_event():
     fake_url = "http://fake.com"
     fake_data = "fake data"
-    when(requests).post(
+    when(client).post(
         url=fake_url, json=fake_data, headers={"Content-Type": "application/json"}
     ).thenReturn(mock({"status_code": 200}))
     response = post_event(fake_url, fake_data)
@@ -72,7 +89,7 @@ def test_create_event():
 def test_create_event_failure():
     fake_url = "http://fake.com"
     fake_data = "fake data"
-    when(requests).post(
+    when(client).post(
         url=fake_url, json=fake_data, headers={"Content-Type": "application/json"}
     ).thenReturn(mock({"status_code": 500}))
     response = post_event(fake_url, fake_data)
@@ -80,13 +97,102 @@ def test_create_event_failure():
     unstub()
 
 
+fake_events = [
+    Event(user_name="fake", reason="vab", event_date="2019-01-01", hours=8),
+    Event(user_name="fake", reason="vab", event_date="2019-01-02", hours=8),
+    Event(user_name="fake", reason="vab", event_date="2019-01-03", hours=8),
+]
+
+
+def test_post_events_batched():
+    fake_url = "http://fake.com"
+    for chunk in (fake_events[:2], fake_events[2:]):
+        when(client).post(
+            url=fake_url, json=json.dumps([event.to_dict() for event in chunk]), headers={"Content-Type": "application/json"}
+        ).thenReturn(mock({"status_code": 200}))
+    assert post_events(fake_url, fake_events, chunk_size=2) == []
+    unstub()
+
+
+def test_post_events_batch_failure():
+    fake_url = "http://fake.com"
+    when(client).post(
+        url=fake_url, json=json.dumps([event.to_dict() for event in fake_events[:2]]), headers={"Content-Type": "application/json"}
+    ).thenReturn(mock({"status_code": 500, "text": "fake error"}))
+    when(client).post(
+        url=fake_url, json=json.dumps([event.to_dict() for event in fake_events[2:]]), headers={"Content-Type": "application/json"}
+    ).thenReturn(mock({"status_code": 200}))
+    assert post_events(fake_url, fake_events, chunk_size=2) == ["2019-01-01", "2019-01-02"]
+    unstub()
+
+
+def test_post_events_fallback():
+    fake_url = "http://fake.com"
+    when(client).post(
+        url=fake_url, json=json.dumps([event.to_dict() for event in fake_events]), headers={"Content-Type": "application/json"}
+    ).thenReturn(mock({"status_code": 404, "text": "not found"}))
+    for event in fake_events:
+        status_code = 500 if event.event_date == "2019-01-02" else 200
+        when(client).post(
+            url=fake_url, json=event.to_json(), headers={"Content-Type": "application/json"}
+        ).thenReturn(mock({"status_code": status_code, "text": "fake"}))
+    assert post_events(fake_url, fake_events) == ["2019-01-02"]
+    unstub()
+
+
+def test_post_events_fallback_on_client_error():
+    fake_url = "http://fake.com"
+    when(client).post(
+        url=fake_url, json=json.dumps([event.to_dict() for event in fake_events]), headers={"Content-Type": "application/json"}
+    ).thenReturn(mock({"status_code": 422, "text": "expected an object"}))
+    for event in fake_events:
+        when(client).post(
+            url=fake_url, json=event.to_json(), headers={"Content-Type": "application/json"}
+        ).thenReturn(mock({"status_code": 200, "text": "fake"}))
+    assert post_events(fake_url, fake_events) == []
+    unstub()
+
+
+def test_post_events_no_fallback_when_rate_limited():
+    fake_url = "http://fake.com"
+    when(client).post(
+        url=fake_url, json=json.dumps([event.to_dict() for event in fake_events]), headers={"Content-Type": "application/json"}
+    ).thenReturn(mock({"status_code": 429, "text": "slow down"}))
+    assert post_events(fake_url, fake_events) == ["2019-01-01", "2019-01-02", "2019-01-03"]
+    verify(client, times=1).post(url=fake_url, json=ANY, headers=ANY)
+    unstub()
+
+
+def test_fan_out_keeps_order():
+    def slow_square(number):
+        time.sleep(0.01 * (5 - number))
+        if number == 3:
+            raise ValueError("fake error")
+        return number * number
+
+    results = fan_out(slow_square, range(5), max_workers=5)
+    assert [result.item for result in results] == [0, 1, 2, 3, 4]
+    assert [result.value for result in results] == [0, 1, 4, None, 16]
+    assert isinstance(results[3].error, ValueError)
+
+
+def test_delete_events():
+    fake_url = "http://fake.com"
+    when(client).delete(url=fake_url, params={"date": "2019-01-01"}).thenReturn(mock({"status_code": 200}))
+    when(client).delete(url=fake_url, params={"date": "2019-01-02"}).thenReturn(
+        mock({"status_code": 500, "text": "fake error"})
+    )
+    assert delete_events(fake_url, ["2019-01-01", "2019-01-02"]) == ["2019-01-02"]
+    unstub()
+
+
 def test_json_factory():
     from .test_data import interactive_message
 
     fake_result = json_factory(interactive_message)
     assert isinstance(fake_result, list)
     for item in ("user_name", "reason", "event_date", "hours"):
-        assert item in fake_result[0]
+        assert getattr(fake_result[0], item) is not None
 
 
 def test_date_to_string():
@@ -97,11 +203,11 @@ def test_date_to_string():
 def test_get_list_data_default():
     month = datetime.now().strftime("%Y-%m") 
     fake_response = "fake list data response"
-    when(requests).get(
+    when(client).get(
         url=fake_user_url,
         params={
             'startDate': f"{month}-01",
-            'endDate': f"{month}-31"
+            'endDate': f"{month}-{monthrange(datetime.now().year, datetime.now().month)[1]}"
         }
     ).thenReturn(mock({"status_code": 200, "text": fake_response}))
     test = get_list_data(
@@ -113,7 +219,7 @@ def test_get_list_data_default():
 
 def test_get_list_data_single_date():
     fake_response = "fake list data response"
-    when(requests).get(
+    when(client).get(
         url=fake_user_url,
         params={"startDate": "2019-01-01", "endDate": "2019-01-01"},
     ).thenReturn(mock({"status_code": 200, "text": fake_response}))
@@ -126,7 +232,7 @@ def test_get_list_data_single_date():
 
 def test_get_list_data_date_range():
     fake_response = "fake list data response"
-    when(requests).get(
+    when(client).get(
         url=fake_user_url,
         params={"startDate": "2019-01-01", "endDate": "2019-01-02"},
     ).thenReturn(mock({"status_code": 200, "text": fake_response}))
@@ -141,7 +247,7 @@ def test_get_list_data_date_range():
 
 def test_get_list_data_month():
     fake_response = "fake list data response"
-    when(requests).get(
+    when(client).get(
         url=fake_user_url,
         params={"startDate": "2019-01-01", "endDate": "2019-01-31"},
     ).thenReturn(mock({"status_code": 200, "text": fake_response}))
@@ -155,7 +261,7 @@ def test_get_list_data_month():
 
 
 def test_get_list_data_faulty_response():
-    when(requests).get(
+    when(client).get(
         url=fake_user_url,
         params={
             'startDate': "2019-01-01",
@@ -175,3 +281,172 @@ def test_create_lock():
 def test_create_lock_faulty_date():
     test = create_lock(user_id="fake", event_date="invalid date string")
     assert test is not True
+
+
+def test_client_reuses_session():
+    assert client.get_session() is client.get_session()
+
+
+def test_client_default_timeout():
+    session = client.get_session()
+    when(session).request(
+        method="get", url="http://fake.com", params=None, timeout=10
+    ).thenReturn(mock({"status_code": 200}))
+    assert client.get("http://fake.com").status_code == 200
+    unstub()
+
+
+def test_client_configure_new_pool():
+    session = client.get_session()
+    client.configure(pool_maxsize=20)
+    assert client.get_session() is not session
+    client.configure(pool_maxsize=10)
+
+
+def test_get_list_data_cached():
+    fake_response = "fake list data response"
+    when(client).get(
+        url=fake_user_url,
+        params={"startDate": "2019-01-01", "endDate": "2019-01-02"},
+    ).thenReturn(mock({"status_code": 200, "text": fake_response}))
+    get_list_data(url="http://fake.nowhere", user_id="fake_userid", date_str="2019-01-01:2019-01-02")
+    unstub()
+
+    test = get_list_data(url="http://fake.nowhere", user_id="fake_userid", date_str="2019-01-01:2019-01-02")
+    assert test == fake_response
+    assert cache_stats()["hits"] >= 1
+
+
+def test_get_list_data_invalidate():
+    when(client).get(
+        url=fake_user_url,
+        params={"startDate": "2019-01-01", "endDate": "2019-01-02"},
+    ).thenReturn(mock({"status_code": 200, "text": "first response"})).thenReturn(
+        mock({"status_code": 200, "text": "second response"})
+    )
+    get_list_data(url="http://fake.nowhere", user_id="fake_userid", date_str="2019-01-01:2019-01-02")
+    invalidate("other_userid", ["2019-01"])
+    invalidate("fake_userid", ["2019-02"])
+    assert get_list_data(url="http://fake.nowhere", user_id="fake_userid", date_str="2019-01-01:2019-01-02") == "first response"
+    invalidate("fake_userid", ["2019-01"])
+    assert get_list_data(url="http://fake.nowhere", user_id="fake_userid", date_str="2019-01-01:2019-01-02") == "second response"
+    unstub()
+
+
+def test_get_list_data_short_month():
+    when(client).get(
+        url=fake_user_url,
+        params={"startDate": "2019-02-01", "endDate": "2019-02-28"},
+    ).thenReturn(mock({"status_code": 200, "text": "fake list data response"}))
+    test = get_list_data(url="http://fake.nowhere", user_id="fake_userid", date_str="2019-02")
+    unstub()
+    assert test == "fake list data response"
+
+
+def test_factory_month():
+    fake_order = dict(user_id="fake", user_name="fake mcFake", text=["add vab 2019-02"])
+    events = factory(fake_order)
+    assert len(events) == 28
+    assert events[-1].event_date == "2019-02-28"
+
+
+def test_event_wire_format():
+    event = Event.from_dict({"user_id": "fake", "event_date": "2019-01-01T00:00:00", "reason": "vab", "hours": "4"})
+    assert event.event_date == "2019-01-01"
+    assert event.hours == 4.0
+    assert event.lock is False
+    assert event.to_dict() == {"user_id": "fake", "event_date": "2019-01-01", "reason": "vab", "hours": 4.0}
+    assert Event.from_dict(json.loads(event.to_json())) == event
+    assert not hasattr(event, "__dict__")
+
+
+def test_iter_events():
+    events = [Event(user_id="fake", event_date="2019-01-01", hours=8.0), Event(event_date="2019-01-02", hours=8.0, lock=True)]
+    assert list(iter_events(events_to_json(events))) == [
+        Event.from_dict(event.to_dict()) for event in events
+    ]
+    assert list(iter_events("[]")) == []
+
+
+@pytest.mark.parametrize("list_data", [
+    '{"message": "Internal"}', '[{"event_date": "2019-01-01"} {"event_date": "2019-01-02"}]', 'null', '[1]', '',
+])
+def test_iter_events_rejects_unexpected_data(list_data):
+    with pytest.raises(ValueError):
+        iter_events(list_data)
+
+
+def test_factory_working_days_only():
+    fake_order = dict(user_id="fake", user_name="fake mcFake", text=["add vab 2019-12-20:2020-01-06"])
+    events = factory(fake_order, working_days_only=True)
+    assert [event.event_date for event in events] == [
+        "2019-12-20", "2019-12-23", "2019-12-27", "2019-12-30", "2020-01-02", "2020-01-03",
+    ]
+    single_day = dict(user_id="fake", user_name="fake mcFake", text=["add vab 2019-12-21"])
+    assert len(factory(single_day, working_days_only=True)) == 1
+
+
+def test_client_retries_idempotent_requests():
+    session = client.get_session()
+    when(client.time).sleep(...).thenReturn()
+    when(session).request(
+        method="get", url="http://fake.com", params=None, timeout=10
+    ).thenReturn(mock({"status_code": 503})).thenReturn(mock({"status_code": 200}))
+    assert client.get("http://fake.com").status_code == 200
+    unstub()
+
+
+def test_client_does_not_retry_posts():
+    session = client.get_session()
+    when(session).request(
+        method="post", url="http://fake.com", data=None, json={}, timeout=10
+    ).thenReturn(mock({"status_code": 503})).thenReturn(mock({"status_code": 200}))
+    assert client.post("http://fake.com", json={}).status_code == 503
+    unstub()
+
+
+def test_client_host_timeout():
+    session = client.get_session()
+    client.configure(host_timeouts={"slow.com": 30})
+    when(session).request(
+        method="get", url="http://slow.com/list", params=None, timeout=30
+    ).thenReturn(mock({"status_code": 200}))
+    assert client.get("http://slow.com/list").status_code == 200
+    client.configure(host_timeouts={})
+    unstub()
+
+
+def test_client_circuit_opens():
+    session = client.get_session()
+    when(client.time).sleep(...).thenReturn()
+    when(session).request(
+        method="delete", url="http://down.com", timeout=10
+    ).thenRaise(client.requests.exceptions.ConnectionError("down"))
+    with pytest.raises(client.requests.exceptions.ConnectionError):
+        client.delete("http://down.com")
+    # The fifth failure opens the circuit, so the last retry is never sent
+    response = client.delete("http://down.com")
+    assert response.status_code == 503
+    assert "Circuit open" in response.text
+    assert client.delete("http://down.com").status_code == 503
+    verify(session, times=5).request(method="delete", url="http://down.com", timeout=10)
+    unstub()
+
+
+def test_circuit_breaker_half_open():
+    now = [0]
+    breaker = client.CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] = 10
+    # One trial request at a time once the reset timeout has passed
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and not breaker.is_open
@@ -0,0 +1,44 @@
+import json
+from chalicelib.lib import timing
+from chalicelib.lib.dispatch import fan_out
+
+
+@timing.timed("fake_call")
+def fake_call(fail=False):
+    if fail:
+        raise ValueError("fake error")
+    return "fake result"
+
+
+def test_timing_disabled(capsys):
+    timing.configure(enable=False)
+    with timing.request("fake_request") as recorder:
+        assert fake_call() == "fake result"
+    assert recorder is None
+    assert capsys.readouterr().out == ""
+
+
+def test_timing_request(capsys):
+    timing.configure(enable=True)
+    try:
+        with timing.request("fake_request", user="fake"):
+            fake_call()
+            fan_out(lambda item: fake_call(), range(3), max_workers=3)
+            try:
+                fake_call(fail=True)
+            except ValueError:
+                pass
+            with timing.span("fake_span") as span:
+                span["status"] = 404
+    finally:
+        timing.configure(enable=False)
+
+    line = json.loads(capsys.readouterr().out)
+    assert line["request"] == "fake_request"
+    assert line["user"] == "fake"
+    assert line["calls"] == {"fake_call": 5, "fake_span": 1}
+    assert [span["status"] for span in line["spans"]].count("error") == 1
+    assert line["spans"][-1]["status"] == 404
+    assert line["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "timereport"
+    assert {"Name": "fake_call", "Unit": "Milliseconds"} in line["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+    assert timing.current() is None
@@ -0,0 +1,59 @@
+import time
+import pytest
+from chalicelib.lib.worker import ThreadQueue, SQLiteQueue, create_queue
+
+
+def test_thread_queue():
+    handled = []
+    worker = ThreadQueue(handled.append)
+    for job in ({"text": ["one"]}, {"text": ["two"]}):
+        worker.put(job)
+    worker.join()
+    assert handled == [{"text": ["one"]}, {"text": ["two"]}]
+
+
+def test_sqlite_queue(tmpdir):
+    handled = []
+    worker = SQLiteQueue(handled.append, path=str(tmpdir.join("jobs.sqlite")), poll_interval=0.01)
+    worker.put({"text": ["one"]})
+    worker.put({"text": ["two"]})
+    assert worker.join(timeout=5)
+    assert handled == [{"text": ["one"]}, {"text": ["two"]}]
+
+
+def test_sqlite_queue_retries_failed_jobs(tmpdir):
+    attempts = []
+
+    def failing_handler(job):
+        attempts.append(job)
+        raise ValueError("fake error")
+
+    worker = SQLiteQueue(
+        failing_handler, path=str(tmpdir.join("jobs.sqlite")), max_attempts=2, poll_interval=0.01, retry_backoff=0.05
+    )
+    worker.put({"text": ["fake"]})
+    assert worker.join(timeout=5)
+    assert len(attempts) == 2
+
+
+def test_sqlite_queue_delays_retries(tmpdir):
+    attempts = []
+
+    def failing_handler(job):
+        attempts.append(time.monotonic())
+        raise ValueError("fake error")
+
+    worker = SQLiteQueue(
+        failing_handler, path=str(tmpdir.join("jobs.sqlite")), max_attempts=3, poll_interval=0.01, retry_backoff=0.1
+    )
+    worker.put({"text": ["fake"]})
+    assert worker.join(timeout=5)
+    assert len(attempts) == 3
+    # 0.1 seconds before the second attempt, 0.2 before the third
+    assert attempts[1] - attempts[0] >= 0.1
+    assert attempts[2] - attempts[1] >= 0.2
+
+
+def test_create_unsupported_queue():
+    with pytest.raises(ValueError):
+        create_queue("fake", print)
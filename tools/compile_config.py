@@ -0,0 +1,20 @@
+"""
+Write chalicelib/config.yaml as a json snapshot (chalicelib/config.json).
+
+Run before `chalice deploy` so lambda doesn't need to import ruamel and parse
+yaml on cold start:
+
+    python tools/compile_config.py
+"""
+import os
+import sys
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(dir_path))
+
+from chalicelib.lib.helpers import compile_config  # noqa: E402
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(dir_path), 'chalicelib', 'config.yaml')
+    print(f'Wrote {compile_config(path)}')
@@ -0,0 +1,65 @@
+"""
+Report the cold start import cost of app.py per module.
+
+Imports the app in a fresh interpreter with `-X importtime` (python 3.7+)
+and prints the slowest modules and the total per top level package:
+
+    python tools/import_report.py [--top 20]
+"""
+import argparse
+import collections
+import os
+import subprocess
+import sys
+
+project_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def measure(module='app'):
+    """
+    Import module in a fresh interpreter
+
+    :param module: The module to import
+    :return: list of (module name, self time in us, cumulative time in us)
+    """
+    env = dict(os.environ)
+    env.setdefault('bot_access_token', 'import-report')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=project_path, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True,
+    )
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings.append((name.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app', help='The module to import')
+    parser.add_argument('--top', type=int, default=20, help='Number of modules to list')
+    args = parser.parse_args()
+
+    timings = measure(args.module)
+    packages = collections.Counter()
+    for name, self_us, _ in timings:
+        packages[name.split('.')[0]] += self_us
+
+    total = sum(packages.values())
+    print(f'Total import time: {total / 1000:.1f} ms\n')
+    print('Per package (self time):')
+    for package, self_us in packages.most_common(args.top):
+        print(f'  {self_us / 1000:8.1f} ms  {package}')
+
+    print('\nSlowest modules (cumulative time):')
+    for name, _, cumulative_us in sorted(timings, key=lambda timing: -timing[2])[:args.top]:
+        print(f'  {cumulative_us / 1000:8.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+    main()